@@ -1,15 +1,28 @@
+import os
+import sys
 from flask import Flask
+
+# The services import each other by module name, so their folder must be importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
 from server.routers.index import registerRoutes
+from server.utils.agentProvider import getAgent
 
 def create_app():
     app = Flask(__name__)
 
     # Basic config
     app.config['DEBUG'] = False
+    app.config['REASONING_MODEL'] = False
+    # Build the shared Agent at startup instead of on the first question
+    app.config['WARM_AGENT'] = os.getenv("WARM_AGENT", "false").lower() == "true"
 
     # Register routes from external module
     registerRoutes(app, "/api")
 
+    if app.config['WARM_AGENT']:
+        getAgent(app.config['REASONING_MODEL'])
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,40 @@
+import os
+import sys
+from quart import Quart
+
+# The services import each other by module name, so their folder must be importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from server.routers.asyncIndex import registerAsyncRoutes
+from server.utils.agentProvider import getAsyncAgent, closeAsyncAgent
+
+# ASGI version of create_app: run with "hypercorn asgi:app --bind 0.0.0.0:3002"
+def create_async_app():
+    app = Quart(__name__)
+
+    # Basic config
+    app.config['DEBUG'] = False
+    app.config['REASONING_MODEL'] = False
+    # Questions processed at once per worker, the others wait for a free slot
+    app.config['MAX_CONCURRENCY'] = int(os.getenv("MAX_CONCURRENCY", "100"))
+    # Build the shared AsyncAgent at startup instead of on the first question
+    app.config['WARM_AGENT'] = os.getenv("WARM_AGENT", "false").lower() == "true"
+
+    # Register routes from external module
+    registerAsyncRoutes(app, "/api")
+
+    @app.before_serving
+    async def startup():
+        if app.config['WARM_AGENT']:
+            getAsyncAgent(app.config['REASONING_MODEL'], app.config['MAX_CONCURRENCY'])
+
+    @app.after_serving
+    async def shutdown():
+        await closeAsyncAgent()
+
+    return app
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=3002)
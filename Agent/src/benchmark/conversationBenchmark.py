@@ -0,0 +1,138 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+
+from ConversationStore import ConversationStore, getMongoClient
+
+# Chat history benchmark against a local mongod: the embedded layout of BD/bd.py (one user
+# document holding every conversation and message) versus ConversationStore (users,
+# conversations and messages collections). Both layouts get the same users with thousands of
+# messages; then we time appending a message, listing the recent conversations and reading
+# the last page of a conversation. Uses (and drops) a separate database.
+#
+#   mongod --dbpath /tmp/mongo-bench
+#   python benchmark/conversationBenchmark.py --users 20 --conversations 50 --messages 100
+
+BENCHMARK_DB = "conversation_benchmark"
+MESSAGE_TEXT = "A quantidade ideal de sono varia, mas geralmente recomenda-se entre 7 a 9 horas por noite. " * 3
+
+
+def buildConversations(count, messagesPerConversation):
+    start = datetime.now(timezone.utc) - timedelta(days=count)
+    return [
+        {
+            "messages": [
+                {"role": "user" if i % 2 == 0 else "bot", "text": MESSAGE_TEXT}
+                for i in range(messagesPerConversation)
+            ],
+            "thumbnail": "https://example.com/thumb.jpg",
+            "created_at": start + timedelta(days=c)
+        }
+        for c in range(count)
+    ]
+
+
+def timeit(operation, repeat):
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        operation(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1] if repeat >= 2 else latencies[0]
+
+
+def benchmarkEmbedded(db, usernames, conversations, repeat, pageSize):
+    users = db["embedded_users"]
+    users.create_index("_username", unique=True)
+
+    start = time.perf_counter()
+    for username in usernames:
+        users.insert_one({"_username": username, "conversations": conversations, "user_info": {}})
+    loadSeconds = time.perf_counter() - start
+
+    last = len(conversations) - 1
+    results = {"load (s)": loadSeconds}
+
+    # Every append rewrites part of an ever-growing document
+    results["append"] = timeit(lambda i: users.update_one(
+        {"_username": usernames[i % len(usernames)]},
+        {"$push": {f"conversations.{last}.messages": {"role": "user", "text": MESSAGE_TEXT}}}
+    ), repeat)
+
+    # Listing conversations has to load the whole history of the user
+    def listRecent(i):
+        user = users.find_one({"_username": usernames[i % len(usernames)]})
+        return sorted(user["conversations"], key=lambda c: c["created_at"], reverse=True)[:pageSize]
+    results["list"] = timeit(listRecent, repeat)
+
+    results["history"] = timeit(lambda i: users.find_one(
+        {"_username": usernames[i % len(usernames)]},
+        {"conversations": {"$slice": [last, 1]}}
+    )["conversations"][0]["messages"][-pageSize:], repeat)
+
+    results["doc size (KB)"] = db.command("collstats", "embedded_users")["avgObjSize"] / 1024
+    return results
+
+
+def benchmarkStore(db, usernames, conversations, repeat, pageSize):
+    store = ConversationStore(client=db.client, dbName=db.name)
+
+    start = time.perf_counter()
+    userIds = [store.importEmbeddedUser({"_username": username, "conversations": conversations}) for username in usernames]
+    loadSeconds = time.perf_counter() - start
+
+    latest = [store.listConversations(userId, limit=1)[0]["_id"] for userId in userIds]
+    results = {"load (s)": loadSeconds}
+
+    results["append"] = timeit(lambda i: store.addMessage(latest[i % len(latest)], "user", MESSAGE_TEXT), repeat)
+    results["list"] = timeit(lambda i: store.listConversations(userIds[i % len(userIds)], limit=pageSize), repeat)
+    results["history"] = timeit(lambda i: store.getMessages(latest[i % len(latest)], limit=pageSize), repeat)
+    results["doc size (KB)"] = db.command("collstats", "messages")["avgObjSize"] / 1024
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedded user documents vs ConversationStore on a local mongod.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=50, help="conversations per user")
+    parser.add_argument("--messages", type=int, default=100, help="messages per conversation")
+    parser.add_argument("--repeat", type=int, default=200, help="timed operations of each kind")
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    client = getMongoClient(args.uri)
+    client.drop_database(BENCHMARK_DB)
+    db = client[BENCHMARK_DB]
+
+    usernames = [f"user{i}" for i in range(args.users)]
+    conversations = buildConversations(args.conversations, args.messages)
+    print(f"{args.users} users x {args.conversations} conversations x {args.messages} messages "
+          f"({args.conversations * args.messages} messages per user)")
+
+    try:
+        results = {
+            "embedded": benchmarkEmbedded(db, usernames, conversations, args.repeat, args.page_size),
+            "store": benchmarkStore(db, usernames, conversations, args.repeat, args.page_size),
+        }
+    finally:
+        client.drop_database(BENCHMARK_DB)
+
+    print(f"{'layout':<10} {'load (s)':>9} {'doc (KB)':>9} "
+          f"{'append p50/p95 (ms)':>20} {'list p50/p95 (ms)':>18} {'history p50/p95 (ms)':>21}")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['load (s)']:>9.2f} {result['doc size (KB)']:>9.1f} "
+            f"{result['append'][0]:>10.2f}/{result['append'][1]:<9.2f} "
+            f"{result['list'][0]:>9.2f}/{result['list'][1]:<8.2f} "
+            f"{result['history'][0]:>10.2f}/{result['history'][1]:<10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+
+# Load benchmark of the question answering endpoint: fires requests at a fixed concurrency
+# and reports throughput and latency, so the sync (Flask) and async (Quart) servers can be compared.
+#
+#   python app.py                                  (sync, port 3001)
+#   hypercorn asgi:app --bind 0.0.0.0:3002         (async, port 3002)
+#   python benchmark/loadBenchmark.py --url sync=http://localhost:3001 --url async=http://localhost:3002 -n 200 -c 50
+
+QUESTIONS_PATH = "../../Benchmarking/grades.json"
+ASK_ROUTE = "/api/globalAgent/ask"
+
+
+def loadQuestions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        grades = json.load(f)
+    return [q["question"] for topic in grades.values() for q in topic.values()]
+
+
+async def runLoad(baseUrl, questions, totalRequests, concurrency, uniqueQuestions, timeout):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=baseUrl, timeout=timeout, limits=limits) as client:
+
+        async def ask(i):
+            nonlocal errors
+            question = questions[i % len(questions)]
+            # A different suffix per request avoids answering from the response cache
+            if uniqueQuestions:
+                question = f"{question} (request {i})"
+
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(ASK_ROUTE, json={"question": question})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[ask(i) for i in range(totalRequests)])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": totalRequests,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 2 else (latencies[0] if latencies else 0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the sync and async question answering servers.")
+    parser.add_argument("--url", action="append", required=True, help="name=baseUrl of a server to benchmark (repeatable)")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="total requests per server")
+    parser.add_argument("-c", "--concurrency", type=int, default=20, help="requests in flight at once")
+    parser.add_argument("--unique", action="store_true", help="make every question unique to bypass the response cache")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-request timeout in seconds")
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="grades.json with the benchmark questions")
+    args = parser.parse_args()
+
+    questions = loadQuestions(args.questions)
+
+    print(f"{'server':<10} {'requests':>8} {'errors':>6} {'seconds':>8} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for target in args.url:
+        name, _, baseUrl = target.partition("=")
+        result = asyncio.run(runLoad(baseUrl, questions, args.requests, args.concurrency, args.unique, args.timeout))
+        print(
+            f"{name:<10} {result['requests']:>8} {result['errors']:>6} {result['seconds']:>8.2f} "
+            f"{result['throughput']:>8.2f} {result['p50']:>8.2f} {result['p95']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
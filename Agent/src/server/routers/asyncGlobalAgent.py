@@ -0,0 +1,59 @@
+from quart import jsonify, request
+from server.utils.logger import logger
+from server.utils.agentProvider import getAsyncAgent
+from server.routers.globalAgent import sseEvent, questionError
+
+# Same routes as registerGlobalAgentRoutes, served by the shared AsyncAgent
+def registerAsyncGlobalAgentRoutes(app, prefix):
+
+    def agent():
+        return getAsyncAgent(app.config["REASONING_MODEL"], app.config["MAX_CONCURRENCY"])
+
+    @app.route(f"{prefix}/")
+    async def welcome():
+        return jsonify({"message": "Welcome to the simplified API!"})
+
+    # Answer a question: POST {"question": "...", "conversationId": optional} -> {"answer": "...", "sources": [...], "cached": bool}
+    # With a conversationId the question is answered as a follow-up of the previous ones with that id
+    @app.route(f"{prefix}/ask", methods=["POST"])
+    async def askQuestion():
+        body = await request.get_json(silent=True) or {}
+        error = questionError(body)
+        if error:
+            return jsonify({"error": error}), 400
+        question = body["question"]
+
+        try:
+            result = await agent().answerQuestion(question, body.get("conversationId"))
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            return jsonify({"error": str(e)}), 500
+
+        return jsonify(result)
+
+    # Stream the answer as Server-Sent Events: "sources", then "token" events, then "done"
+    # GET /ask/stream?question=...&conversationId=... (EventSource) or POST {"question": "...", "conversationId": ...}
+    @app.route(f"{prefix}/ask/stream", methods=["GET", "POST"])
+    async def askQuestionStream():
+        if request.method == "POST":
+            body = await request.get_json(silent=True) or {}
+        else:
+            body = request.args
+        error = questionError(body)
+        if error:
+            return jsonify({"error": error}), 400
+        question = body["question"]
+        conversationId = body.get("conversationId")
+
+        questionAgent = agent()
+
+        async def generate():
+            try:
+                async for event, data in questionAgent.streamQuestion(question, conversationId):
+                    yield sseEvent(event, data)
+                yield sseEvent("done", {})
+            except Exception as e:
+                logger.error(f"Error streaming answer: {e}")
+                yield sseEvent("error", {"error": str(e)})
+
+        return generate(), 200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
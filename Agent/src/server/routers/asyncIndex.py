@@ -0,0 +1,21 @@
+from quart import request
+from datetime import datetime
+from server.utils.logger import logger
+from server.routers.asyncGlobalAgent import registerAsyncGlobalAgentRoutes
+
+# Same as registerRoutes, for the async (Quart) app
+def registerAsyncRoutes(app, path):
+    # Optional: Request timing
+    @app.before_request
+    async def before_request():
+        request.start_time = datetime.now()
+
+    @app.after_request
+    async def after_request(response):
+        if hasattr(request, 'start_time'):
+            duration = datetime.now() - request.start_time
+            logger.info(f"Done in {duration.total_seconds():.2f}s - {response.status_code}")
+        return response
+
+    # Register your global agent routes
+    registerAsyncGlobalAgentRoutes(app, prefix=f"{path}/globalAgent")
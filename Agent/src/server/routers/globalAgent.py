@@ -1,7 +1,80 @@
-from flask import jsonify
+import json
+from flask import jsonify, request, Response, stream_with_context
+from server.utils.logger import logger
+from server.utils.agentProvider import getAgent
+
+# Format one Server-Sent Event
+def sseEvent(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Error message for a question request body with a missing or invalid field (None if it is valid)
+def questionError(body):
+    if not hasattr(body, "get"):
+        return "The request body must be a JSON object."
+
+    question = body.get("question", "")
+    if not isinstance(question, str):
+        return "'question' must be a string."
+    if not question.strip():
+        return "Missing 'question'."
+
+    conversationId = body.get("conversationId")
+    if conversationId is not None and not isinstance(conversationId, str):
+        return "'conversationId' must be a string."
+
+    return None
 
 def registerGlobalAgentRoutes(app, prefix):
     
     @app.route(f"{prefix}/")
-    def askQuestion():
+    def welcome():
         return jsonify({"message": "Welcome to the simplified API!"})
+
+    # Answer a question: POST {"question": "...", "conversationId": optional} -> {"answer": "...", "sources": [...], "cached": bool}
+    # With a conversationId the question is answered as a follow-up of the previous ones with that id
+    @app.route(f"{prefix}/ask", methods=["POST"])
+    def askQuestion():
+        body = request.get_json(silent=True) or {}
+        error = questionError(body)
+        if error:
+            return jsonify({"error": error}), 400
+        question = body["question"]
+
+        try:
+            result = getAgent(app.config["REASONING_MODEL"]).answerQuestion(question, body.get("conversationId"))
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            return jsonify({"error": str(e)}), 500
+
+        return jsonify(result)
+
+    # Stream the answer as Server-Sent Events: "sources", then "token" events, then "done"
+    # GET /ask/stream?question=...&conversationId=... (EventSource) or POST {"question": "...", "conversationId": ...}
+    @app.route(f"{prefix}/ask/stream", methods=["GET", "POST"])
+    def askQuestionStream():
+        if request.method == "POST":
+            body = request.get_json(silent=True) or {}
+        else:
+            body = request.args
+        error = questionError(body)
+        if error:
+            return jsonify({"error": error}), 400
+        question = body["question"]
+        conversationId = body.get("conversationId")
+
+        questionAgent = getAgent(app.config["REASONING_MODEL"])
+
+        def generate():
+            try:
+                for event, data in questionAgent.streamQuestion(question, conversationId):
+                    yield sseEvent(event, data)
+                yield sseEvent("done", {})
+            except Exception as e:
+                logger.error(f"Error streaming answer: {e}")
+                yield sseEvent("error", {"error": str(e)})
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
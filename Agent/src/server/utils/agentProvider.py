@@ -0,0 +1,48 @@
+import os
+import threading
+from server.utils.logger import logger
+from Agent import Agent
+
+# One Agent per worker process, shared by all its request threads. It keeps the context
+# prompt, the Pinecone client and index connection, the LLM client and the caches warm.
+_agent = None
+_agentPid = None
+_lock = threading.Lock()
+_asyncAgent = None
+
+def getAgent(reasoningModel=False):
+    global _agent, _agentPid
+
+    # A worker forked from a process that already built the Agent must not reuse its connections
+    if _agent is not None and _agentPid == os.getpid():
+        return _agent
+
+    with _lock:
+        if _agent is None or _agentPid != os.getpid():
+            logger.info("Initialising the shared Agent...")
+            _agent = Agent(reasoningModel=reasoningModel)
+            _agentPid = os.getpid()
+
+    return _agent
+
+
+# Async entry point: one AsyncAgent per worker event loop. Building it does not await,
+# so no other request can interleave and build a second one.
+def getAsyncAgent(reasoningModel=False, maxConcurrency=100):
+    global _asyncAgent
+
+    if _asyncAgent is None:
+        # Imported here so the Flask app does not load quart and the async clients
+        from AsyncAgent import AsyncAgent
+
+        logger.info("Initialising the shared AsyncAgent...")
+        _asyncAgent = AsyncAgent(reasoningModel=reasoningModel, maxConcurrency=maxConcurrency)
+
+    return _asyncAgent
+
+async def closeAsyncAgent():
+    global _asyncAgent
+
+    if _asyncAgent is not None:
+        await _asyncAgent.close()
+        _asyncAgent = None
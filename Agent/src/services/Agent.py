@@ -1,35 +1,100 @@
 from LLMClient import LLMClient
 from PineconeHandler import PineconeHandler
+from ResponseCache import ResponseCache
+from ConversationMemory import ConversationMemory
+
+NOT_ENOUGH_INFORMATION = "The articles do not provide enough information to answer completely."
 
 class Agent:
     
-    def __init__(self, reasoningModel=True):
+    # responseCache: cache of previous answers, defaults to an exact-match ResponseCache
+    # conversationMemory: history of multi-turn conversations, defaults to a ConversationMemory over
+    #   the store chosen by CONVERSATION_STORE (in-process unless it is "mongodb", see defaultHistoryStore)
+    def __init__(self, reasoningModel=True, responseCache=None, conversationMemory=None):
         
         self.contextPrompt=self.loadInitialPrompt("config/contextPrompt.txt")
         self.pineconeHandler = PineconeHandler()
         self.llmClient = LLMClient(reasoningModel)
+        self.responseCache = responseCache if responseCache is not None else ResponseCache()
+        self.conversationMemory = conversationMemory if conversationMemory is not None else ConversationMemory(self.llmClient)
         
     def loadInitialPrompt(self, path):
         with open(path, "r", encoding="utf-8") as f:
             return f.read()
         
-    def submitQuestion(self, prompt):
-        
-        context = self.pineconeHandler.query(prompt)
-        
-        if context == "":
-            print("The articles do not provide enough information to answer completely.")
-            return
-        
-        # Create the final prompt for the LLM
-        finalPrompt = (
+    def buildPrompt(self, prompt, context, history=""):
+        return (
             f"{self.contextPrompt}\n\n"
-            "Question:\n"
+            + (f"Conversation history:\n{history}\n\n" if history else "")
+            + "Question:\n"
             f"{prompt}\n\n"
             "Articles context:\n"
             f"{context}"
         )
 
+    # Arguments identifying the answer of a question in the response cache.
+    # A follow-up question is only the same question when asked after the same history.
+    def responseCacheKey(self, prompt, matches, queryEmbedding=None, history=""):
+        return {
+            "model": self.llmClient.model,
+            "contextPrompt": self.contextPrompt,
+            "history": history,
+            "question": prompt,
+            "chunkIds": [match["id"] for match in matches],
+            "corpusVersion": self.pineconeHandler.corpusVersion(),
+            "queryEmbedding": queryEmbedding
+        }
+
+    # The query embedding is only needed by the near-duplicate mode of the response cache
+    def cacheQueryEmbedding(self, prompt):
+        if self.responseCache.similarityThreshold is None:
+            return None
+        return self.pineconeHandler.embedQuery(prompt)
+
+    # Retrieved articles returned to the API clients alongside the answer
+    def buildSources(self, matches):
+        return [
+            {"id": match["id"], "score": match["score"], "title": match["metadata"].get("title"), "link": match["metadata"].get("link")}
+            for match in matches
+        ]
+
+    # Retrieval query and prompt history of a question (the question itself and "" outside a conversation)
+    def conversationContext(self, prompt, conversationId):
+        if conversationId is None:
+            return prompt, ""
+
+        memory = self.conversationMemory.getContext(conversationId)
+        return self.conversationMemory.retrievalQuery(prompt, memory), self.conversationMemory.formatHistory(memory)
+
+    def rememberTurn(self, conversationId, prompt, answer):
+        if conversationId is not None:
+            self.conversationMemory.addTurn(conversationId, prompt, answer)
+
+    # Answer a question and return {"answer", "sources", "cached"}
+    # conversationId: answer it as the next turn of that conversation (previous turns are used
+    # for retrieval and generation, and this turn is remembered)
+    def answerQuestion(self, prompt, conversationId=None):
+
+        retrievalQuery, history = self.conversationContext(prompt, conversationId)
+        matches = self.pineconeHandler.retrieve(retrievalQuery)
+        context = self.pineconeHandler.buildContext(matches)
+        
+        if context == "":
+            self.rememberTurn(conversationId, prompt, NOT_ENOUGH_INFORMATION)
+            return {"answer": NOT_ENOUGH_INFORMATION, "sources": [], "cached": False}
+
+        sources = self.buildSources(matches)
+
+        # Reuse the answer of a previous question asked with the same retrieved context
+        cacheKey = self.responseCacheKey(prompt, matches, self.cacheQueryEmbedding(prompt), history)
+        response = self.responseCache.get(**cacheKey)
+        if response is not None:
+            self.rememberTurn(conversationId, prompt, response)
+            return {"answer": response, "sources": sources, "cached": True}
+        
+        # Create the final prompt for the LLM
+        finalPrompt = self.buildPrompt(prompt, context, history)
+
         # # Debugging output 
         # print("\nAll context:")
         # print(finalPrompt)
@@ -39,14 +104,56 @@ class Agent:
         
         
         # Get the LLM response
-        try:
-            response = self.llmClient.generateResponse(finalPrompt)
+        response = self.llmClient.generateResponse(finalPrompt)
+        self.responseCache.put(**cacheKey, response=response)
+        self.rememberTurn(conversationId, prompt, response)
 
-            print("Response:")
-            print(response)
-            
-        except Exception as e:
-            raise
+        return {"answer": response, "sources": sources, "cached": False}
+
+    def submitQuestion(self, prompt, conversationId=None):
+
+        result = self.answerQuestion(prompt, conversationId)
+
+        if not result["sources"]:
+            print(result["answer"])
+            return
+
+        print("Response (cached):" if result["cached"] else "Response:")
+        print(result["answer"])
+        return result["answer"]
+
+    # Same as submitQuestion, but yields (event, data) pairs as the answer is generated:
+    # one "sources" event with the retrieved articles, then "token" events with the answer text
+    def streamQuestion(self, prompt, conversationId=None):
+
+        retrievalQuery, history = self.conversationContext(prompt, conversationId)
+        matches = self.pineconeHandler.retrieve(retrievalQuery)
+        context = self.pineconeHandler.buildContext(matches)
+
+        if context == "":
+            self.rememberTurn(conversationId, prompt, NOT_ENOUGH_INFORMATION)
+            yield "sources", []
+            yield "token", NOT_ENOUGH_INFORMATION
+            return
+
+        yield "sources", self.buildSources(matches)
+
+        cacheKey = self.responseCacheKey(prompt, matches, self.cacheQueryEmbedding(prompt), history)
+        response = self.responseCache.get(**cacheKey)
+        if response is not None:
+            self.rememberTurn(conversationId, prompt, response)
+            yield "token", response
+            return
+
+        # Stream the LLM response and cache it once it is complete
+        tokens = []
+        for token in self.llmClient.streamResponse(self.buildPrompt(prompt, context, history)):
+            tokens.append(token)
+            yield "token", token
+
+        response = "".join(tokens).strip()
+        self.responseCache.put(**cacheKey, response=response)
+        self.rememberTurn(conversationId, prompt, response)
             
             
 
@@ -61,6 +168,6 @@ if __name__ == "__main__":
         if prompt.strip().upper() == "EXIT":
             break
         
-        # Retrieve relevant chunks using the embeddings
-        agent.submitQuestion(prompt)
+        # Retrieve relevant chunks using the embeddings, following up on the previous questions
+        agent.submitQuestion(prompt, conversationId="cli")
 
@@ -0,0 +1,114 @@
+import asyncio
+from Agent import Agent, NOT_ENOUGH_INFORMATION
+from AsyncLLMClient import AsyncLLMClient
+from AsyncPineconeHandler import AsyncPineconeHandler
+from ConversationMemory import ConversationMemory
+from LLMClient import LLMClient
+from ResponseCache import ResponseCache
+
+class AsyncAgent(Agent):
+
+    # Asyncio version of Agent: a single event loop keeps many questions waiting on
+    # embedding, index and LLM calls at the same time.
+    # maxConcurrency: maximum number of questions processed at once, the others wait their turn
+    # conversationMemory: as in Agent. Its store and summary calls block, so they run in a thread
+    #   (summaries are generated by a blocking LLMClient)
+    def __init__(self, reasoningModel=True, responseCache=None, maxConcurrency=100, conversationMemory=None):
+
+        self.contextPrompt = self.loadInitialPrompt("config/contextPrompt.txt")
+        self.pineconeHandler = AsyncPineconeHandler()
+        self.llmClient = AsyncLLMClient(reasoningModel)
+        self.responseCache = responseCache if responseCache is not None else ResponseCache()
+        self.semaphore = asyncio.Semaphore(maxConcurrency)
+        self.conversationMemory = conversationMemory if conversationMemory is not None else ConversationMemory(LLMClient(reasoningModel))
+
+    async def cacheQueryEmbedding(self, prompt):
+        if self.responseCache.similarityThreshold is None:
+            return None
+        return await self.pineconeHandler.embedQuery(prompt)
+
+    async def conversationContext(self, prompt, conversationId):
+        if conversationId is None:
+            return prompt, ""
+        return await asyncio.to_thread(Agent.conversationContext, self, prompt, conversationId)
+
+    async def rememberTurn(self, conversationId, prompt, answer):
+        if conversationId is not None:
+            await asyncio.to_thread(self.conversationMemory.addTurn, conversationId, prompt, answer)
+
+    # Answer a question and return {"answer", "sources", "cached"}
+    # conversationId: answer it as the next turn of that conversation, as in Agent.answerQuestion
+    async def answerQuestion(self, prompt, conversationId=None):
+
+        async with self.semaphore:
+            retrievalQuery, history = await self.conversationContext(prompt, conversationId)
+            matches = await self.pineconeHandler.retrieve(retrievalQuery)
+            context = self.pineconeHandler.buildContext(matches)
+
+            if context == "":
+                await self.rememberTurn(conversationId, prompt, NOT_ENOUGH_INFORMATION)
+                return {"answer": NOT_ENOUGH_INFORMATION, "sources": [], "cached": False}
+
+            sources = self.buildSources(matches)
+
+            # Reuse the answer of a previous question asked with the same retrieved context
+            cacheKey = self.responseCacheKey(prompt, matches, await self.cacheQueryEmbedding(prompt), history)
+            response = self.responseCache.get(**cacheKey)
+            if response is not None:
+                await self.rememberTurn(conversationId, prompt, response)
+                return {"answer": response, "sources": sources, "cached": True}
+
+            # Get the LLM response
+            response = await self.llmClient.generateResponse(self.buildPrompt(prompt, context, history))
+            self.responseCache.put(**cacheKey, response=response)
+            await self.rememberTurn(conversationId, prompt, response)
+
+            return {"answer": response, "sources": sources, "cached": False}
+
+    async def submitQuestion(self, prompt, conversationId=None):
+
+        result = await self.answerQuestion(prompt, conversationId)
+
+        if not result["sources"]:
+            print(result["answer"])
+            return
+
+        print("Response (cached):" if result["cached"] else "Response:")
+        print(result["answer"])
+        return result["answer"]
+
+    # Yields ("sources", [...]) and then ("token", text) pairs as the answer is generated
+    async def streamQuestion(self, prompt, conversationId=None):
+
+        async with self.semaphore:
+            retrievalQuery, history = await self.conversationContext(prompt, conversationId)
+            matches = await self.pineconeHandler.retrieve(retrievalQuery)
+            context = self.pineconeHandler.buildContext(matches)
+
+            if context == "":
+                await self.rememberTurn(conversationId, prompt, NOT_ENOUGH_INFORMATION)
+                yield "sources", []
+                yield "token", NOT_ENOUGH_INFORMATION
+                return
+
+            yield "sources", self.buildSources(matches)
+
+            cacheKey = self.responseCacheKey(prompt, matches, await self.cacheQueryEmbedding(prompt), history)
+            response = self.responseCache.get(**cacheKey)
+            if response is not None:
+                await self.rememberTurn(conversationId, prompt, response)
+                yield "token", response
+                return
+
+            # Stream the LLM response and cache it once it is complete
+            tokens = []
+            async for token in self.llmClient.streamResponse(self.buildPrompt(prompt, context, history)):
+                tokens.append(token)
+                yield "token", token
+
+            response = "".join(tokens).strip()
+            self.responseCache.put(**cacheKey, response=response)
+            await self.rememberTurn(conversationId, prompt, response)
+
+    async def close(self):
+        await self.pineconeHandler.close()
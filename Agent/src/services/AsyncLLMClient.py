@@ -0,0 +1,70 @@
+import os
+import together
+from together import AsyncTogether
+from LLMClient import LLMClient, ThinkFilter
+
+class AsyncLLMClient(LLMClient):
+
+    # Same models and configuration as LLMClient, with the async TogetherAI client
+    def __init__(self, reasoningModel: bool = False):
+        super().__init__(reasoningModel)
+        self.client = AsyncTogether(api_key=os.getenv("TOGETHERAI_AI_KEY"))
+
+    # Send a prompt to the LLM and return the response
+    async def generateResponse(self, prompt: str) -> str:
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+
+            if self.reasoningModel:
+                cleanResponse = self.cleanResponse(response.choices[0].message.content)
+            else:
+                cleanResponse = response.choices[0].message.content
+
+            return cleanResponse
+
+        except together.error.InvalidRequestError as e:
+            raise Exception("There was an issue with the request. Please check the input and try again.")
+
+        except together.error.RateLimitError as e:
+            raise Exception("Rate limit reached. You have exceeded the maximum number of requests for this model. Please try again later.")
+
+        except Exception as e:
+            raise Exception("An unexpected error occurred.")
+
+    # Send a prompt to the LLM and yield the response text as it is generated
+    async def streamResponse(self, prompt: str):
+        thinkFilter = ThinkFilter() if self.reasoningModel else None
+
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            )
+
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content or ""
+
+                if thinkFilter is not None:
+                    token = thinkFilter.feed(token)
+                if token:
+                    yield token
+
+            if thinkFilter is not None:
+                token = thinkFilter.flush()
+                if token:
+                    yield token
+
+        except together.error.InvalidRequestError as e:
+            raise Exception("There was an issue with the request. Please check the input and try again.")
+
+        except together.error.RateLimitError as e:
+            raise Exception("Rate limit reached. You have exceeded the maximum number of requests for this model. Please try again later.")
+
+        except Exception as e:
+            raise Exception("An unexpected error occurred.")
@@ -0,0 +1,152 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from pinecone import PineconeAsyncio
+from EmbeddingCache import EmbeddingCache
+from LocalVectorIndex import LocalVectorIndex
+from PineconeHandler import PineconeHandler, LOCAL_INDEX_PATH, chunkedDataVersion
+
+class AsyncPineconeHandler:
+    # Asyncio version of PineconeHandler's retrieval path (embedding, search and selection).
+    # Ingestion and building the local index stay in PineconeHandler.
+    # backend: "pinecone" or "local" (the local index must already be built)
+    # embedder: object with embed(texts, inputType) (run in a thread) or async aembed(texts, inputType)
+    def __init__(self, backend="pinecone", embedder=None, localIndexPath=LOCAL_INDEX_PATH,
+                 singlePassSearch=True, candidateMultiplier=2, embeddingCache=None):
+        if backend not in ("pinecone", "local"):
+            raise ValueError(f"Unknown retrieval backend '{backend}'. Use 'pinecone' or 'local'.")
+
+        self.backend = backend
+        self.indexName = "project"
+        self.namespace = "ns1"
+        self.embeddingModel = "llama-text-embed-v2"
+        self.singlePassSearch = singlePassSearch
+        self.candidateMultiplier = candidateMultiplier
+        self.embedder = embedder
+        self.embeddingCache = embeddingCache if embeddingCache is not None else EmbeddingCache()
+        self.pc = None
+        self.index = None
+        self.indexLock = asyncio.Lock()
+
+        if backend == "pinecone" or embedder is None:
+            load_dotenv()
+            apiKey = os.getenv("PINECONE_API_KEY")
+            if not apiKey:
+                raise ValueError("PINECONE_API_KEY environment variable not set.")
+
+            # Async Pinecone client (aiohttp connection pool shared by every request)
+            self.pc = PineconeAsyncio(api_key=apiKey)
+
+        if backend == "local":
+            self.index = LocalVectorIndex(localIndexPath)
+
+            # The index cannot be rebuilt here (see PineconeHandler), and scores against vectors
+            # of another embedding model are meaningless
+            embedderModel = getattr(embedder, "model", None) if embedder is not None else self.embeddingModel
+            if self.index.model != embedderModel:
+                raise ValueError(f"Local index built with embedding model '{self.index.model}', not '{embedderModel}'. "
+                                 "Rebuild it with PineconeHandler(backend=\"local\").")
+
+
+    # The async index needs the index host, fetched once on first use
+    async def getIndex(self):
+        if self.index is None:
+            async with self.indexLock:
+                if self.index is None:
+                    description = await self.pc.describe_index(self.indexName)
+                    self.index = self.pc.IndexAsyncio(host=description.host)
+        return self.index
+
+
+    async def close(self):
+        if self.backend == "pinecone" and self.index is not None:
+            await self.index.close()
+        if self.pc is not None:
+            await self.pc.close()
+
+
+    def corpusVersion(self):
+        return chunkedDataVersion()
+
+
+    async def embed(self, texts, inputType):
+        if self.embedder is None:
+            embeddings = await self.pc.inference.embed(
+                model=self.embeddingModel,
+                inputs=texts,
+                parameters={"input_type": inputType}
+            )
+            return [e["values"] for e in embeddings]
+
+        if hasattr(self.embedder, "aembed"):
+            return await self.embedder.aembed(texts, inputType)
+
+        return await asyncio.to_thread(self.embedder.embed, texts, inputType)
+
+
+    async def embedQuery(self, queryText):
+        model = self.embeddingModel if self.embedder is None else getattr(self.embedder, "model", type(self.embedder).__name__)
+
+        vector = self.embeddingCache.get(queryText, model)
+        if vector is None:
+            vector = (await self.embed([queryText], "query"))[0]
+            self.embeddingCache.put(queryText, model, vector)
+        return vector
+
+
+    async def queryPinecone(self, vector, topK, filter):
+        index = await self.getIndex()
+        results = await index.query(
+            namespace=self.namespace,
+            vector=vector,
+            top_k=topK,
+            include_values=False,
+            include_metadata=True,
+            filter=filter
+        )
+        return results.get("matches", [])
+
+
+    # Matches of every level: one request in single-pass mode, otherwise one concurrent request per level
+    async def searchAllLevels(self, vector, topK, maxHierarchyLevel):
+        levels = range(1, maxHierarchyLevel + 1)
+
+        if self.backend == "local":
+            return self.index.searchLevels(vector, topK, levels)
+
+        if self.singlePassSearch:
+            poolSize = topK * maxHierarchyLevel * self.candidateMultiplier
+            matches = await self.queryPinecone(vector, poolSize, {"hierarchy": {"$lte": maxHierarchyLevel}})
+            matchesByLevel = PineconeHandler.partitionByLevel(matches, topK, levels)
+
+            # Levels crowded out of a full pool are queried on their own, concurrently
+            crowdedOut = PineconeHandler.crowdedOutLevels(matchesByLevel, len(matches), poolSize, topK)
+            levelMatches = await asyncio.gather(*[
+                self.queryPinecone(vector, topK, {"hierarchy": level}) for level in crowdedOut
+            ])
+            matchesByLevel.update(zip(crowdedOut, levelMatches))
+            return matchesByLevel
+
+        levelMatches = await asyncio.gather(*[
+            self.queryPinecone(vector, topK, {"hierarchy": level}) for level in levels
+        ])
+        return dict(zip(levels, levelMatches))
+
+
+    async def retrieve(self, queryText, topK=5, targetThreshold=0.6, minimumThreshold=0.2, maxHierarchyLevel=3):
+        queryEmbedding = await self.embedQuery(queryText)
+        matchesByLevel = await self.searchAllLevels(queryEmbedding, topK, maxHierarchyLevel)
+
+        return PineconeHandler.selectMatches(
+            lambda level: matchesByLevel.get(level, []),
+            topK, targetThreshold, minimumThreshold, maxHierarchyLevel
+        )
+
+
+    def buildContext(self, finalResults):
+        return PineconeHandler.buildContext(finalResults)
+
+
+    async def query(self, queryText, topK=5, targetThreshold=0.6, minimumThreshold=0.2, maxHierarchyLevel=3):
+        finalResults = await self.retrieve(queryText, topK, targetThreshold, minimumThreshold, maxHierarchyLevel)
+        return self.buildContext(finalResults)
@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Same logger configured in server/utils/logger.py
+logger = logging.getLogger("app_logger")
+
+
+# Rough token count (about 4 characters per token for English text), enough to keep budgets
+def estimateTokens(text):
+    return len(text) // 4 + 1
+
+
+class InMemoryHistory:
+    # Conversation messages kept in the process, with the same interface ConversationMemory uses
+    # from ConversationStore. Messages already folded into a summary are dropped.
+    # maxConversations: least recently used conversations are forgotten first
+    def __init__(self, maxConversations=1024):
+        self.maxConversations = maxConversations
+        self.conversations = OrderedDict()  # conversationId -> {"messages", "nextSeq", "summary"}
+        self.lock = threading.Lock()
+
+
+    def conversation(self, conversationId):
+        conversation = self.conversations.get(conversationId)
+        if conversation is None:
+            conversation = {"messages": [], "nextSeq": 0, "summary": None}
+            self.conversations[conversationId] = conversation
+            while len(self.conversations) > self.maxConversations:
+                self.conversations.popitem(last=False)
+        self.conversations.move_to_end(conversationId)
+        return conversation
+
+
+    def addMessages(self, conversationId, messages):
+        with self.lock:
+            conversation = self.conversation(conversationId)
+            seqs = []
+            for message in messages:
+                conversation["messages"].append({"seq": conversation["nextSeq"], "role": message["role"], "text": message["text"]})
+                seqs.append(conversation["nextSeq"])
+                conversation["nextSeq"] += 1
+            return seqs
+
+
+    # Conversation ids are used as they are
+    def resolveConversation(self, conversationId):
+        return conversationId
+
+
+    def getMessages(self, conversationId, limit=50):
+        with self.lock:
+            return list(self.conversation(conversationId)["messages"][-limit:])
+
+
+    def iterMessages(self, conversationId, afterSeq=-1):
+        with self.lock:
+            messages = list(self.conversation(conversationId)["messages"])
+        return (message for message in messages if message["seq"] > afterSeq)
+
+
+    def getSummary(self, conversationId):
+        with self.lock:
+            return self.conversation(conversationId)["summary"]
+
+
+    def saveSummary(self, conversationId, summary, summarizedSeq):
+        with self.lock:
+            conversation = self.conversation(conversationId)
+            conversation["summary"] = {"summary": summary, "summarizedSeq": summarizedSeq}
+            conversation["messages"] = [m for m in conversation["messages"] if m["seq"] >= summarizedSeq]
+
+
+# Store of the Agent's conversation history, chosen with CONVERSATION_STORE in .env:
+# "mongodb" keeps it in a ConversationStore, shared by every worker; "memory" (the default)
+# keeps it in the process, which only works with a single worker: a follow-up question
+# served by another worker would not see the previous turns.
+def defaultHistoryStore():
+    load_dotenv()
+    if os.getenv("CONVERSATION_STORE", "memory").lower() == "mongodb":
+        from ConversationStore import ConversationStore
+        return ConversationStore()
+
+    return InMemoryHistory()
+
+
+class ConversationMemory:
+    # Multi-turn context for the Agent: the last turns of a conversation verbatim, under a token
+    # budget, plus a rolling summary of everything older.
+    # When turns fall out of the window they are folded into the summary with one LLM call that
+    # updates the previous summary (it is never rebuilt from the whole history), so each question
+    # adds at most historyTokens + summaryTokens tokens to the prompt, however long the conversation.
+    # llmClient: client used to update the summaries (generateResponse)
+    # store: a ConversationStore to read/write the messages and persist the summaries,
+    #   by default defaultHistoryStore()
+    # maxTurns: question/answer pairs kept verbatim
+    # historyTokens: token budget of the verbatim turns (older ones go to the summary first)
+    # summaryTokens: approximate size of the rolling summary
+    # retrievalTurns: previous user questions added to the retrieval query of a follow-up
+    # maxCachedSummaries: rolling summaries kept in memory (LRU), the store keeps all of them
+    def __init__(self, llmClient, store=None, maxTurns=4, historyTokens=1500, summaryTokens=300,
+                 retrievalTurns=2, maxCachedSummaries=1024, countTokens=estimateTokens,
+                 summaryPromptPath="config/summaryPrompt.txt"):
+        self.llmClient = llmClient
+        self.store = store if store is not None else defaultHistoryStore()
+        self.maxTurns = maxTurns
+        self.historyTokens = historyTokens
+        self.summaryTokens = summaryTokens
+        self.retrievalTurns = retrievalTurns
+        self.maxCachedSummaries = maxCachedSummaries
+        self.countTokens = countTokens
+
+        with open(summaryPromptPath, "r", encoding="utf-8") as f:
+            self.summaryPrompt = f.read()
+
+        self.summaries = OrderedDict()  # conversationId -> {"summary", "summarizedSeq"}
+        self.locks = {}                 # conversationId -> lock held while its summary is updated
+        self.lock = threading.Lock()
+
+
+    def conversationLock(self, conversationId):
+        with self.lock:
+            return self.locks.setdefault(conversationId, threading.Lock())
+
+
+    def cachedSummary(self, conversationId):
+        with self.lock:
+            state = self.summaries.get(conversationId)
+            if state is not None:
+                self.summaries.move_to_end(conversationId)
+                return state
+
+        state = self.store.getSummary(conversationId) or {"summary": "", "summarizedSeq": 0}
+        self.cacheSummary(conversationId, state)
+        return state
+
+
+    def cacheSummary(self, conversationId, state):
+        with self.lock:
+            self.summaries[conversationId] = state
+            self.summaries.move_to_end(conversationId)
+            while len(self.summaries) > self.maxCachedSummaries:
+                evicted, _ = self.summaries.popitem(last=False)
+                self.locks.pop(evicted, None)
+
+
+    # Most recent messages that fit in maxTurns and historyTokens, starting at a user question
+    # (an answer whose question no longer fits goes to the summary with it)
+    def selectRecent(self, messages):
+        recent = []
+        tokens = 0
+        for message in reversed(messages):
+            messageTokens = self.countTokens(message["text"])
+            if len(recent) >= 2 * self.maxTurns or tokens + messageTokens > self.historyTokens:
+                break
+            recent.append(message)
+            tokens += messageTokens
+
+        recent.reverse()
+        while recent and recent[0]["role"] != "user":
+            recent.pop(0)
+        return recent
+
+
+    # Fold messages into the summary, a batch of at most historyTokens tokens per LLM call
+    def updateSummary(self, summary, messages):
+        batch = []
+        tokens = 0
+        for message in messages:
+            messageTokens = self.countTokens(message["text"])
+            if batch and tokens + messageTokens > self.historyTokens:
+                summary = self.summarize(summary, batch)
+                batch, tokens = [], 0
+            batch.append(message)
+            tokens += messageTokens
+        if batch:
+            summary = self.summarize(summary, batch)
+        return summary
+
+
+    def summarize(self, summary, messages):
+        prompt = (
+            f"{self.summaryPrompt.format(maxWords=int(self.summaryTokens * 0.75))}\n\n"
+            "Current summary:\n"
+            f"{summary or '(empty)'}\n\n"
+            "New messages:\n"
+            f"{self.formatMessages(messages)}"
+        )
+        return self.llmClient.generateResponse(prompt).strip()
+
+
+    @staticmethod
+    def formatMessages(messages):
+        return "\n".join(f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['text']}" for m in messages)
+
+
+    # {"summary", "turns"} to answer the next question of a conversation. Turns that no longer
+    # fit in the window are folded into the rolling summary here, once.
+    # conversationId: the id given to the Agent (the store resolves it to its own conversation id)
+    def getContext(self, conversationId):
+        conversationId = self.store.resolveConversation(conversationId)
+        messages = self.store.getMessages(conversationId, limit=2 * self.maxTurns)
+        recent = self.selectRecent(messages)
+        firstRecentSeq = recent[0]["seq"] if recent else (messages[-1]["seq"] + 1 if messages else 0)
+
+        state = self.cachedSummary(conversationId)
+        if firstRecentSeq > state["summarizedSeq"]:
+            with self.conversationLock(conversationId):
+                # Another worker sharing the store may have updated the summary already
+                state = self.store.getSummary(conversationId) or self.cachedSummary(conversationId)
+                self.cacheSummary(conversationId, state)
+                if firstRecentSeq > state["summarizedSeq"]:
+                    dropped = []
+                    for message in self.store.iterMessages(conversationId, afterSeq=state["summarizedSeq"] - 1):
+                        if message["seq"] >= firstRecentSeq:
+                            break
+                        dropped.append(message)
+
+                    # A failed summary must not fail the answer: use the recent turns with the
+                    # summary saved so far, and try again on the next question
+                    try:
+                        summary = self.updateSummary(state["summary"], dropped)
+                    except Exception as e:
+                        logger.error(f"Error summarizing conversation {conversationId}: {e}")
+                        return {"summary": state["summary"], "turns": recent}
+
+                    state = {"summary": summary, "summarizedSeq": firstRecentSeq}
+                    self.store.saveSummary(conversationId, summary, firstRecentSeq)
+                    self.cacheSummary(conversationId, state)
+                    logger.info(f"Summarized {len(dropped)} messages of conversation {conversationId}.")
+
+        return {"summary": state["summary"], "turns": recent}
+
+
+    # Text added to the generation prompt ("" for the first question of a conversation)
+    def formatHistory(self, context):
+        parts = []
+        if context["summary"]:
+            parts.append(f"Summary of the earlier conversation:\n{context['summary']}")
+        if context["turns"]:
+            parts.append(f"Recent messages:\n{self.formatMessages(context['turns'])}")
+        return "\n\n".join(parts)
+
+
+    # Query embedded for retrieval: a follow-up question ("and for children?") alone often does
+    # not say what it is about, so the last user questions of the window are prepended
+    def retrievalQuery(self, question, context):
+        previous = [m["text"] for m in context["turns"] if m["role"] == "user"][-self.retrievalTurns:] if self.retrievalTurns else []
+        return "\n".join(previous + [question])
+
+
+    def addTurn(self, conversationId, question, answer):
+        conversationId = self.store.resolveConversation(conversationId)
+        self.store.addMessages(conversationId, [{"role": "user", "text": question}, {"role": "bot", "text": answer}])
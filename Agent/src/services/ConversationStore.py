@@ -0,0 +1,259 @@
+import os
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from bson import ObjectId
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+DEFAULT_URI = "mongodb://localhost:27017"
+DEFAULT_DB = "projeto_md"
+
+# One MongoClient per (uri, process): a client owns a connection pool and is thread-safe,
+# so every store and request thread of a worker shares it. It is not fork-safe, so a
+# forked worker builds its own (same rule as server/utils/agentProvider.py).
+_clients = {}
+_clientsLock = threading.Lock()
+
+def getMongoClient(uri=None, maxPoolSize=50):
+    if uri is None:
+        load_dotenv()
+        uri = os.getenv("MONGODB_URI", DEFAULT_URI)
+
+    key = (uri, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _clientsLock:
+            client = _clients.get(key)
+            if client is None:
+                client = MongoClient(uri, maxPoolSize=maxPoolSize)
+                _clients[key] = client
+    return client
+
+
+def utcNow():
+    return datetime.now(timezone.utc)
+
+
+class ConversationStore:
+    # Chat history kept in three collections instead of one document per user (BD/bd.py):
+    #   users:         {_id, username, userInfo, createdAt}
+    #   conversations: {_id, userId, thumbnail, title, createdAt, updatedAt, messageCount, externalId}
+    #   messages:      {_id, conversationId, seq, role, text, createdAt}
+    # Appending a message is one small insert (plus a counter update on its conversation), and
+    # history is read in pages through the (userId, createdAt) and (conversationId, seq) indexes.
+    # uri / dbName: default to MONGODB_URI / MONGODB_DB from .env (localhost and projeto_md otherwise)
+    # client: an existing MongoClient, by default the shared one from getMongoClient
+    def __init__(self, uri=None, dbName=None, client=None, createIndexes=True):
+        load_dotenv()
+        self.client = client if client is not None else getMongoClient(uri)
+        self.db = self.client[dbName or os.getenv("MONGODB_DB", DEFAULT_DB)]
+        self.users = self.db["users"]
+        self.conversations = self.db["conversations"]
+        self.messages = self.db["messages"]
+
+        if createIndexes:
+            self.createIndexes()
+
+
+    # Index creation is idempotent, so every worker can call it on start.
+    # The users collection may still hold documents of the old layout (BD/bd.py, "_username"
+    # and no "username"), so the unique index only covers documents that have a username.
+    def createIndexes(self):
+        self.users.create_index(
+            [("username", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"username": {"$exists": True}}
+        )
+        self.conversations.create_index([("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)])
+        self.conversations.create_index(
+            [("externalId", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"externalId": {"$exists": True}}
+        )
+        self.messages.create_index([("conversationId", ASCENDING), ("seq", ASCENDING)], unique=True)
+
+
+    # Id of the user with this username, created on the first call
+    def getOrCreateUser(self, username, userInfo=None):
+        user = self.users.find_one_and_update(
+            {"username": username},
+            {"$setOnInsert": {"username": username, "userInfo": userInfo or {}, "createdAt": utcNow()}},
+            upsert=True,
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return user["_id"]
+
+
+    def getUser(self, username):
+        return self.users.find_one({"username": username})
+
+
+    def createConversation(self, userId, thumbnail=None, title=None):
+        now = utcNow()
+        result = self.conversations.insert_one({
+            "userId": userId,
+            "thumbnail": thumbnail,
+            "title": title,
+            "createdAt": now,
+            "updatedAt": now,
+            "messageCount": 0
+        })
+        return result.inserted_id
+
+
+    def getConversation(self, conversationId):
+        return self.conversations.find_one({"_id": conversationId})
+
+
+    # Id of the conversation of an API conversation id: an existing conversation when it is the
+    # string of its ObjectId, otherwise the conversation with that externalId, created on the
+    # first call (without a user). Every worker resolves the same API id to the same conversation.
+    def resolveConversation(self, conversationId):
+        if isinstance(conversationId, ObjectId):
+            return conversationId
+        if ObjectId.is_valid(conversationId) and self.conversations.count_documents({"_id": ObjectId(conversationId)}, limit=1):
+            return ObjectId(conversationId)
+
+        now = utcNow()
+        query = {"externalId": str(conversationId)}
+        update = {"$setOnInsert": {
+            "externalId": str(conversationId),
+            "userId": None,
+            "thumbnail": None,
+            "title": None,
+            "createdAt": now,
+            "updatedAt": now,
+            "messageCount": 0
+        }}
+        try:
+            conversation = self.conversations.find_one_and_update(
+                query, update, upsert=True, projection={"_id": 1}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker created it at the same time
+            conversation = self.conversations.find_one(query, {"_id": 1})
+        return conversation["_id"]
+
+
+    # Append messages ({"role", "text"}) to a conversation with a single insert_many.
+    # The conversation's messageCount is incremented first, which atomically reserves the
+    # seq numbers of the new messages, so concurrent writers never get the same seq.
+    def addMessages(self, conversationId, messages):
+        messages = list(messages)
+        if not messages:
+            return []
+
+        now = utcNow()
+        conversation = self.conversations.find_one_and_update(
+            {"_id": conversationId},
+            {"$inc": {"messageCount": len(messages)}, "$set": {"updatedAt": now}},
+            projection={"messageCount": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if conversation is None:
+            raise KeyError(f"Conversation {conversationId} not found.")
+
+        firstSeq = conversation["messageCount"] - len(messages)
+        documents = [
+            {
+                "conversationId": conversationId,
+                "seq": firstSeq + i,
+                "role": message["role"],
+                "text": message["text"],
+                "createdAt": message.get("createdAt", now)
+            }
+            for i, message in enumerate(messages)
+        ]
+        self.messages.insert_many(documents, ordered=False)
+        return [document["seq"] for document in documents]
+
+
+    def addMessage(self, conversationId, role, text):
+        return self.addMessages(conversationId, [{"role": role, "text": text}])[0]
+
+
+    # One page of a user's conversations, most recent first. Pass the last conversation of a
+    # page as `after` to get the next one (keyset pagination: no skip, every page costs the same).
+    def listConversations(self, userId, limit=20, after=None):
+        query = {"userId": userId}
+        if after is not None:
+            query["$or"] = [
+                {"createdAt": {"$lt": after["createdAt"]}},
+                {"createdAt": after["createdAt"], "_id": {"$lt": after["_id"]}}
+            ]
+
+        cursor = self.conversations.find(query).sort([("createdAt", DESCENDING), ("_id", DESCENDING)]).limit(limit)
+        return list(cursor)
+
+
+    # One page of a conversation's messages in chronological order: the last `limit` messages,
+    # or the `limit` messages before seq `beforeSeq` (pass the seq of the first message of a page
+    # to scroll back further)
+    def getMessages(self, conversationId, limit=50, beforeSeq=None):
+        query = {"conversationId": conversationId}
+        if beforeSeq is not None:
+            query["seq"] = {"$lt": beforeSeq}
+
+        cursor = self.messages.find(query, {"_id": 0, "conversationId": 0}).sort("seq", DESCENDING).limit(limit)
+        return list(cursor)[::-1]
+
+
+    # Every message of a conversation (or those after seq `afterSeq`), read page by page in chronological order
+    def iterMessages(self, conversationId, pageSize=500, afterSeq=-1):
+        lastSeq = afterSeq
+        while True:
+            page = list(
+                self.messages.find({"conversationId": conversationId, "seq": {"$gt": lastSeq}}, {"_id": 0, "conversationId": 0})
+                .sort("seq", ASCENDING)
+                .limit(pageSize)
+            )
+            yield from page
+            if len(page) < pageSize:
+                return
+            lastSeq = page[-1]["seq"]
+
+
+    # Rolling summary of a conversation kept by ConversationMemory: {"summary", "summarizedSeq"} or None
+    def getSummary(self, conversationId):
+        conversation = self.conversations.find_one({"_id": conversationId}, {"summary": 1, "summarizedSeq": 1})
+        if conversation is None or "summary" not in conversation:
+            return None
+        return {"summary": conversation["summary"], "summarizedSeq": conversation["summarizedSeq"]}
+
+
+    def saveSummary(self, conversationId, summary, summarizedSeq):
+        self.conversations.update_one({"_id": conversationId}, {"$set": {"summary": summary, "summarizedSeq": summarizedSeq}})
+
+
+    def deleteConversation(self, conversationId):
+        self.messages.delete_many({"conversationId": conversationId})
+        self.conversations.delete_one({"_id": conversationId})
+
+
+    # Copy a user document of the old embedded layout (BD/bd.py: "_username", "user_info" and
+    # "conversations" with their "messages") into the three collections, with one insert_many
+    # per conversation. Returns the new user id.
+    def importEmbeddedUser(self, userDocument):
+        userId = self.getOrCreateUser(userDocument["_username"], userDocument.get("user_info"))
+
+        for conversation in userDocument.get("conversations", []):
+            createdAt = conversation.get("created_at", utcNow())
+            messages = conversation.get("messages", [])
+            conversationId = self.conversations.insert_one({
+                "userId": userId,
+                "thumbnail": conversation.get("thumbnail"),
+                "title": conversation.get("title"),
+                "createdAt": createdAt,
+                "updatedAt": createdAt,
+                "messageCount": len(messages)
+            }).inserted_id
+
+            if messages:
+                self.messages.insert_many([
+                    {"conversationId": conversationId, "seq": seq, "role": message["role"], "text": message["text"], "createdAt": createdAt}
+                    for seq, message in enumerate(messages)
+                ], ordered=False)
+
+        return userId
@@ -0,0 +1,45 @@
+import hashlib
+import math
+import re
+
+
+class PineconeEmbedder:
+    # Embed texts remotely with Pinecone Inference (llama-text-embed-v2)
+    def __init__(self, pc, model="llama-text-embed-v2"):
+        self.pc = pc
+        self.model = model
+
+    def embed(self, texts, inputType="passage"):
+        embeddings = self.pc.inference.embed(
+            model=self.model,
+            inputs=texts,
+            parameters={"input_type": inputType}
+        )
+        return [e["values"] for e in embeddings]
+
+
+class HashingEmbedder:
+    # Local stand-in embedder (feature hashing of word unigrams and bigrams).
+    # It needs no network or API key, so the local index can be built and queried offline.
+    def __init__(self, dimension=1024, model="hashing-embed"):
+        self.dimension = dimension
+        self.model = model
+
+    def embed(self, texts, inputType="passage"):
+        return [self.embedOne(text) for text in texts]
+
+    def embedOne(self, text):
+        vector = [0.0] * self.dimension
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm > 0:
+            vector = [v / norm for v in vector]
+        return vector
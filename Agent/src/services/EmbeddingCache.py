@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Same logger configured in server/utils/logger.py
+logger = logging.getLogger("app_logger")
+
+
+# Questions that only differ in case, spacing or trailing punctuation share the same key
+def normalizeQuery(text):
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+class EmbeddingCache:
+    # Bounded LRU cache of query embeddings keyed on (model, normalized query text)
+    # maxSize: maximum number of embeddings kept (0 disables the cache)
+    # ttl: seconds an embedding stays valid (None keeps it until evicted)
+    # persistPath: optional JSON file loaded on start and saved every saveEvery new entries and on exit
+    # logEvery: log the hit/miss counters every logEvery lookups
+    def __init__(self, maxSize=1024, ttl=None, persistPath=None, saveEvery=20, logEvery=100):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.persistPath = persistPath
+        self.saveEvery = saveEvery
+        self.logEvery = logEvery
+
+        self.entries = OrderedDict()  # key -> (vector, createdAt)
+        self.lock = threading.Lock()
+        self.saveLock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unsavedEntries = 0
+
+        if self.persistPath:
+            self.load()
+            atexit.register(self.save)
+
+
+    @staticmethod
+    def key(text, model):
+        return f"{model}\x00{normalizeQuery(text)}"
+
+
+    def isExpired(self, createdAt):
+        return self.ttl is not None and time.time() - createdAt > self.ttl
+
+
+    def get(self, text, model):
+        key = self.key(text, model)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.isExpired(entry[1]):
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            lookups = self.hits + self.misses
+
+        if self.logEvery and lookups % self.logEvery == 0:
+            self.logStats()
+
+        return entry[0] if entry is not None else None
+
+
+    def put(self, text, model, vector):
+        if self.maxSize <= 0:
+            return
+
+        with self.lock:
+            key = self.key(text, model)
+            self.entries[key] = (list(vector), time.time())
+            self.entries.move_to_end(key)
+
+            # Evict the least recently used embeddings
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+            self.unsavedEntries += 1
+            shouldSave = self.persistPath and self.unsavedEntries >= self.saveEvery
+
+        if shouldSave:
+            self.save()
+
+
+    # Return the cached embedding or compute it with embedFunction() and cache it
+    def getOrEmbed(self, text, model, embedFunction):
+        vector = self.get(text, model)
+        if vector is None:
+            vector = embedFunction()
+            self.put(text, model, vector)
+        return vector
+
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries)
+            }
+
+
+    def logStats(self):
+        stats = self.stats()
+        logger.info(
+            f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hitRate']:.0%} hit rate), {stats['size']} entries"
+        )
+
+
+    def load(self):
+        try:
+            with open(self.persistPath, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        # Stored from least to most recently used, so the LRU order survives restarts
+        with self.lock:
+            for key, vector, createdAt in stored:
+                if not self.isExpired(createdAt):
+                    self.entries[key] = (vector, createdAt)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+
+    def save(self):
+        if not self.persistPath:
+            return
+
+        with self.lock:
+            stored = [[key, vector, createdAt] for key, (vector, createdAt) in self.entries.items()]
+            self.unsavedEntries = 0
+
+        directory = os.path.dirname(self.persistPath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so a crash never leaves a half-written cache
+        with self.saveLock:
+            tmpPath = self.persistPath + ".tmp"
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                json.dump(stored, f, separators=(",", ":"))
+            os.replace(tmpPath, self.persistPath)
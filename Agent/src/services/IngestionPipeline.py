@@ -0,0 +1,141 @@
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# The ChunkedData files are read with the same reader the Data scripts write them with
+# (Data/src/chunk_io.py, standard library only), so both sides always agree on the formats
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "Data", "src"))
+
+from chunk_io import iter_chunks
+
+
+# Yield the chunks of a ChunkedData file one at a time.
+# JSON Lines (.jsonl, or gzip-compressed .jsonl.gz) is read line by line; a JSON array (.json)
+# is streamed when ijson is installed and loaded whole otherwise.
+iterChunks = iter_chunks
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestionPipeline:
+    # Embeds and upserts chunks into the Pinecone index of a PineconeHandler.
+    # Batches run concurrently on a bounded thread pool, failed batches are retried with
+    # exponential backoff, and the id and fingerprint of every upserted chunk are appended to a
+    # checkpoint file so a crashed run resumes where it stopped. A chunk is only skipped when it
+    # was upserted with the same content. The checkpoint is removed once a run completes.
+    # onUpserted: optional function called with each batch of chunks once it is upserted
+    # fingerprint: function of a chunk that changes with its content, by default handler.chunkFingerprint
+    def __init__(self, handler, batchSize=50, workers=4, maxRetries=5, backoffSeconds=1.0, checkpointPath=None, onUpserted=None,
+                 fingerprint=None):
+        self.handler = handler
+        self.batchSize = batchSize
+        self.workers = workers
+        self.maxRetries = maxRetries
+        self.backoffSeconds = backoffSeconds
+        self.checkpointPath = checkpointPath or f"../../Data/Cache/ingestion-{handler.indexName}-{handler.namespace}.txt"
+        self.checkpointLock = threading.Lock()
+        self.onUpserted = onUpserted
+        self.fingerprint = fingerprint or handler.chunkFingerprint
+
+
+    # Set of "chunk_id\tfingerprint" lines (lines of older checkpoints, without a fingerprint, never match)
+    def loadCheckpoint(self):
+        try:
+            with open(self.checkpointPath, "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+
+    def checkpointKey(self, d):
+        return f"{d['chunk_id']}\t{self.fingerprint(d)}"
+
+
+    def saveCheckpoint(self, batch):
+        with self.checkpointLock:
+            with open(self.checkpointPath, "a", encoding="utf-8") as f:
+                f.write("".join(f"{self.checkpointKey(d)}\n" for d in batch))
+
+
+    # Embed and upsert one batch, retrying with exponential backoff and jitter
+    def processBatch(self, batchNumber, batch):
+        for attempt in range(self.maxRetries + 1):
+            try:
+                vectors = self.handler.dataEmbedding(batch)
+                self.handler.index.upsert(vectors=vectors, namespace=self.handler.namespace)
+                self.saveCheckpoint(batch)
+                if self.onUpserted is not None:
+                    self.onUpserted(batch)
+                return len(batch)
+
+            except Exception as e:
+                if attempt == self.maxRetries:
+                    print(f"Error upserting batch {batchNumber}, giving up after {attempt + 1} attempts: {e}")
+                    return 0
+
+                wait_time = self.backoffSeconds * 2 ** attempt + random.uniform(0, self.backoffSeconds)
+                print(f"Error upserting batch {batchNumber}: {e}. Retrying in {wait_time:.1f}s...")
+                time.sleep(wait_time)
+
+
+    def run(self, chunks):
+        os.makedirs(os.path.dirname(self.checkpointPath) or ".", exist_ok=True)
+
+        done = self.loadCheckpoint()
+        if done:
+            print(f"Resuming ingestion, {len(done)} chunks already upserted.")
+
+        pending = (d for d in chunks if self.checkpointKey(d) not in done)
+
+        upserted = 0
+        failed = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            inFlight = {}
+
+            for batchNumber, batch in enumerate(batched(pending, self.batchSize), start=1):
+                inFlight[executor.submit(self.processBatch, batchNumber, batch)] = len(batch)
+
+                # Keep a bounded number of batches in memory, so the input is consumed as a stream
+                if len(inFlight) >= self.workers * 2:
+                    finished, _ = wait(inFlight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        size = inFlight.pop(future)
+                        count = future.result()
+                        upserted += count
+                        failed += size - count
+                    self.reportProgress(upserted, failed, start)
+
+            for future, size in inFlight.items():
+                count = future.result()
+                upserted += count
+                failed += size - count
+
+        elapsed = time.perf_counter() - start
+        rate = upserted / elapsed if elapsed > 0 else 0.0
+        print(f"Upserted {upserted} chunks in {elapsed:.1f}s ({rate:.1f} chunks/s), {failed} failed.")
+
+        # A complete run does not need to be resumed
+        if failed == 0 and os.path.exists(self.checkpointPath):
+            os.remove(self.checkpointPath)
+
+        return {"upserted": upserted, "failed": failed, "seconds": elapsed, "chunksPerSecond": rate}
+
+
+    def reportProgress(self, upserted, failed, start):
+        elapsed = time.perf_counter() - start
+        rate = upserted / elapsed if elapsed > 0 else 0.0
+        print(f"{upserted} chunks upserted, {failed} failed ({rate:.1f} chunks/s)")
@@ -6,6 +6,73 @@ from dotenv import load_dotenv
 import re
 import together
 
+
+class ThinkFilter:
+    # Incremental version of cleanResponse: removes <think>...</think> sections from a token stream.
+    # Text that could be the start of a tag is held back until the next token decides it, and a
+    # <think> section is held back until it closes: cleanResponse keeps a section that never closes.
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self.insideThink = False
+        self.pending = ""
+        self.thinking = ""  # the open <think> section so far, emitted by flush if it never closes
+        self.started = False
+
+    # Length of the longest suffix of text that is a prefix of tag
+    @staticmethod
+    def partialTagLength(text, tag):
+        for length in range(min(len(text), len(tag) - 1), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
+
+    # Feed a new token and return the visible text it produces (possibly "")
+    def feed(self, token):
+        self.pending += token
+        visible = ""
+
+        while True:
+            tag = self.CLOSE_TAG if self.insideThink else self.OPEN_TAG
+            index = self.pending.find(tag)
+
+            if index >= 0:
+                if self.insideThink:
+                    self.thinking = ""
+                else:
+                    visible += self.pending[:index]
+                    self.thinking = tag
+                self.pending = self.pending[index + len(tag):]
+                self.insideThink = not self.insideThink
+                continue
+
+            keep = self.partialTagLength(self.pending, tag)
+            if self.insideThink:
+                self.thinking += self.pending[:len(self.pending) - keep]
+            else:
+                visible += self.pending[:len(self.pending) - keep]
+            self.pending = self.pending[len(self.pending) - keep:]
+            break
+
+        return self.emit(visible)
+
+    # Return whatever was held back once the stream ends, including a <think> section that never
+    # closed (as cleanResponse, which only removes closed sections)
+    def flush(self):
+        visible = self.thinking + self.pending
+        self.pending = ""
+        self.thinking = ""
+        return self.emit(visible)
+
+    # Leading whitespace is dropped, as strip() does in cleanResponse
+    def emit(self, visible):
+        if not self.started:
+            visible = visible.lstrip()
+            self.started = visible != ""
+        return visible
+
+
 class LLMClient:
     
     # Initialize the LLM client by loading the API key
@@ -49,6 +116,42 @@ class LLMClient:
             raise Exception("An unexpected error occurred.")
         
             
+    # Send a prompt to the LLM and yield the response text as it is generated
+    def streamResponse(self, prompt: str):
+        thinkFilter = ThinkFilter() if self.reasoningModel else None
+
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            )
+
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content or ""
+
+                if thinkFilter is not None:
+                    token = thinkFilter.feed(token)
+                if token:
+                    yield token
+
+            if thinkFilter is not None:
+                token = thinkFilter.flush()
+                if token:
+                    yield token
+
+        except together.error.InvalidRequestError as e:
+            raise Exception("There was an issue with the request. Please check the input and try again.")
+
+        except together.error.RateLimitError as e:
+            raise Exception("Rate limit reached. You have exceeded the maximum number of requests for this model. Please try again later.")
+
+        except Exception as e:
+            raise Exception("An unexpected error occurred.")
+
+
     # Remove the <think>...</think> section from the response (present in reasoning models)
     def cleanResponse(self, response):
         return re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL).strip()
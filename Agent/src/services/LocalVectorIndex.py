@@ -0,0 +1,174 @@
+import json
+import os
+import numpy as np
+from IngestionPipeline import batched
+
+
+class LocalVectorIndex:
+    # In-process vector index: a memory-mapped matrix of normalized chunk embeddings
+    # plus a compact metadata sidecar. Rows are stored grouped by hierarchy level,
+    # so searching one level only scores a contiguous slice of the matrix.
+
+    MATRIX_FILE = "embeddings.npy"
+    METADATA_FILE = "metadata.json"
+    FIELDS = ["text", "title", "link", "year", "topic", "hierarchy", "parent", "children"]
+    BLOCK_SIZE = 8192
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, self.METADATA_FILE), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+
+        self.ids = sidecar["ids"]
+        self.rows = sidecar["rows"]
+        self.fields = sidecar["fields"]
+        self.model = sidecar.get("model")
+        self.levels = {int(level): tuple(bounds) for level, bounds in sidecar["levels"].items()}
+
+        # The matrix is never fully read into memory, pages are loaded on demand
+        self.matrix = np.load(os.path.join(path, self.MATRIX_FILE), mmap_mode="r")
+        self.dimension = self.matrix.shape[1]
+
+
+    @classmethod
+    def exists(cls, path):
+        return (os.path.exists(os.path.join(path, cls.MATRIX_FILE))
+                and os.path.exists(os.path.join(path, cls.METADATA_FILE)))
+
+
+    # Embed every chunk and write the matrix and sidecar to disk.
+    # data: a list of records, or a function returning a fresh iterator over them, so the
+    # records can be streamed from disk twice (once to size the levels, once to embed them)
+    # instead of being held in memory as a sorted list.
+    @classmethod
+    def build(cls, path, data, embedder, dimension, dtype="float32", batchSize=50):
+        os.makedirs(path, exist_ok=True)
+        records = data if callable(data) else lambda: iter(data)
+
+        # First pass: count the rows of each hierarchy level to lay the levels out contiguously
+        counts = {}
+        for d in records():
+            counts[d["hierarchy"]] = counts.get(d["hierarchy"], 0) + 1
+
+        levels = {}
+        total = 0
+        for level in sorted(counts):
+            levels[level] = [total, total + counts[level]]
+            total += counts[level]
+
+        tmpFile = os.path.join(path, cls.MATRIX_FILE + ".tmp")
+        matrix = np.lib.format.open_memmap(tmpFile, mode="w+", dtype=np.dtype(dtype), shape=(total, dimension))
+
+        # Second pass: each record goes to the next free row of its level (keeps the file order inside each level)
+        cursors = {level: bounds[0] for level, bounds in levels.items()}
+        ids = [None] * total
+        rows = [None] * total
+
+        for batchNumber, batch in enumerate(batched(records(), batchSize), start=1):
+            print(f"Embedding batch {batchNumber} / {total // batchSize + 1}...")
+
+            vectors = np.asarray(embedder.embed([d["text"] for d in batch], "passage"), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+
+            for d, vector in zip(batch, vectors):
+                row = cursors[d["hierarchy"]]
+                cursors[d["hierarchy"]] += 1
+                matrix[row] = vector
+                ids[row] = d["id"]
+                rows[row] = [d.get(field) for field in cls.FIELDS]
+
+        matrix.flush()
+        del matrix
+
+        sidecar = {
+            "model": getattr(embedder, "model", None),
+            "fields": cls.FIELDS,
+            "ids": ids,
+            "rows": rows,
+            "levels": {str(level): bounds for level, bounds in levels.items()}
+        }
+
+        with open(os.path.join(path, cls.METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, ensure_ascii=False, separators=(",", ":"))
+
+        os.replace(tmpFile, os.path.join(path, cls.MATRIX_FILE))
+        return cls(path)
+
+
+    # Cosine scores of a query vector against rows [start, end)
+    def score(self, vector, start=0, end=None):
+        end = len(self.ids) if end is None else end
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        if self.matrix.dtype == np.float32:
+            return self.matrix[start:end] @ query
+
+        # float16 has no BLAS path, so upcast block by block to keep memory bounded
+        scores = np.empty(end - start, dtype=np.float32)
+        for blockStart in range(start, end, self.BLOCK_SIZE):
+            blockEnd = min(blockStart + self.BLOCK_SIZE, end)
+            block = self.matrix[blockStart:blockEnd].astype(np.float32)
+            scores[blockStart - start:blockEnd - start] = block @ query
+        return scores
+
+
+    # Indexes (relative to scores) of the topK best scores, best first
+    @staticmethod
+    def topIndexes(scores, topK):
+        if topK <= 0 or len(scores) == 0:
+            return np.empty(0, dtype=np.int64)
+        if topK < len(scores):
+            candidates = np.argpartition(-scores, topK - 1)[:topK]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+    def match(self, row, score):
+        return {
+            "id": self.ids[row],
+            "score": float(score),
+            "metadata": dict(zip(self.fields, self.rows[row]))
+        }
+
+
+    # Same result shape as a Pinecone query match list
+    def search(self, vector, topK=5, hierarchy=None):
+        if hierarchy is None:
+            start, end = 0, len(self.ids)
+        elif hierarchy in self.levels:
+            start, end = self.levels[hierarchy]
+        else:
+            return []
+
+        scores = self.score(vector, start, end)
+        return [self.match(start + i, scores[i]) for i in self.topIndexes(scores, topK)]
+
+
+    # Top matches of several hierarchy levels, scoring the rows of all of them in one pass
+    def searchLevels(self, vector, topK, levels):
+        bounds = [self.levels[level] for level in levels if level in self.levels]
+        if not bounds:
+            return {level: [] for level in levels}
+
+        start = min(b[0] for b in bounds)
+        end = max(b[1] for b in bounds)
+        scores = self.score(vector, start, end)
+
+        matchesByLevel = {}
+        for level in levels:
+            if level not in self.levels:
+                matchesByLevel[level] = []
+                continue
+            levelStart, levelEnd = self.levels[level]
+            levelScores = scores[levelStart - start:levelEnd - start]
+            matchesByLevel[level] = [self.match(levelStart + i, levelScores[i]) for i in self.topIndexes(levelScores, topK)]
+
+        return matchesByLevel
@@ -4,19 +4,80 @@ from pinecone import Pinecone, ServerlessSpec, PineconeApiException
 import os
 from dotenv import load_dotenv
 import random
+import heapq
+import hashlib
+import threading
+from Embedders import PineconeEmbedder
+from LocalVectorIndex import LocalVectorIndex
+from EmbeddingCache import EmbeddingCache
+from IngestionPipeline import IngestionPipeline, iterChunks, batched
+
+CHUNKED_DATA_DIR = "../../Data/ChunkedData"
+
+# ChunkedData is written as JSON Lines, optionally gzip-compressed; the old JSON array is still read
+def findChunkedData():
+    for name in ["ChunkedData.jsonl.gz", "ChunkedData.jsonl", "ChunkedData.json"]:
+        path = os.path.join(CHUNKED_DATA_DIR, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(CHUNKED_DATA_DIR, "ChunkedData.jsonl")
+
+CHUNKED_DATA_PATH = findChunkedData()
+LOCAL_INDEX_PATH = "../../Data/LocalIndex"
+
+# Changes whenever the ChunkedData file is rewritten
+def chunkedDataVersion():
+    try:
+        stat = os.stat(CHUNKED_DATA_PATH)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except FileNotFoundError:
+        return "missing"
 
 class PineconeHandler:
-    def __init__(self):
-        load_dotenv()
-        apiKey = os.getenv("PINECONE_API_KEY")
-        if not apiKey:
-            raise ValueError("PINECONE_API_KEY environment variable not set.")
-        
-        # Pinecone config
-        self.pc = Pinecone(api_key=apiKey)
+    # backend: "pinecone" queries the remote index, "local" queries an in-process memory-mapped index
+    # embedder: any object with embed(texts, inputType); defaults to Pinecone Inference
+    # singlePassSearch: fetch all hierarchy levels with one search instead of one search per level
+    # embeddingCache: cache of query embeddings, defaults to an in-memory EmbeddingCache
+    def __init__(self, backend="pinecone", embedder=None, localIndexPath=LOCAL_INDEX_PATH, localIndexDtype="float32",
+                 singlePassSearch=True, candidateMultiplier=2, embeddingCache=None):
+        if backend not in ("pinecone", "local"):
+            raise ValueError(f"Unknown retrieval backend '{backend}'. Use 'pinecone' or 'local'.")
+
+        self.backend = backend
         self.indexName = "project"
         self.dimension = 1024
         self.namespace = "ns1"
+        self.pc = None
+        self.singlePassSearch = singlePassSearch
+        self.candidateMultiplier = candidateMultiplier
+        self.ingestionCount = 0
+
+        # The Pinecone client is only needed for the remote index or the default embedder
+        if backend == "pinecone" or embedder is None:
+            load_dotenv()
+            apiKey = os.getenv("PINECONE_API_KEY")
+            if not apiKey:
+                raise ValueError("PINECONE_API_KEY environment variable not set.")
+
+            # Pinecone config
+            self.pc = Pinecone(api_key=apiKey)
+
+        self.embedder = embedder if embedder is not None else PineconeEmbedder(self.pc)
+        self.embeddingCache = embeddingCache if embeddingCache is not None else EmbeddingCache()
+
+        if backend == "local":
+            # Build the local index from the chunked data the first time
+            if not LocalVectorIndex.exists(localIndexPath):
+                print("Local index not found. Building it...")
+                self.buildLocalIndex(localIndexPath, localIndexDtype)
+            self.index = LocalVectorIndex(localIndexPath)
+
+            # Scores against vectors of another embedding model are meaningless, so rebuild the index
+            if self.index.model != getattr(self.embedder, "model", None):
+                print(f"Local index built with embedding model '{self.index.model}', not '{getattr(self.embedder, 'model', None)}'. Rebuilding it...")
+                self.index = None  # release the memory map of the old matrix before it is replaced
+                self.index = self.buildLocalIndex(localIndexPath, localIndexDtype)
+            return
 
         # Ensure index exists or create it
         self.index, hasJustBeenCreated = self.getIndex()
@@ -46,95 +107,259 @@ class PineconeHandler:
         return self.pc.Index(self.indexName), created
 
        
+    # Metadata stored with each vector (shared by the Pinecone and local backends)
+    @staticmethod
+    def chunkMetadata(d):
+        metadata = {
+            'text': d['chunk_text'],
+            'title': d['title'],
+            'link': d['link'] if d['link'] is not None else "",
+            'year': d['year'] if d['year'] is not None else "",
+            'topic': d['topic'] if d['topic'] is not None else "",
+            'hierarchy': d['hierarchical_level']
+        }
+
+        # Links between hierarchy levels, only stored when the chunk has them (Pinecone rejects null values)
+        if d.get('parent_id'):
+            metadata['parent'] = d['parent_id']
+        if d.get('children_ids'):
+            metadata['children'] = d['children_ids']
+
+        return metadata
+
+
     def dataEmbedding(self, data):
         print("Adding data to the index...")
         data = [d for d in data]
 
         # Create embeddings for filtered data
         textsToEmbed = [d['chunk_text'] for d in data]
-        embeddings = self.pc.inference.embed(
-            model="llama-text-embed-v2",
-            inputs=textsToEmbed,
-            parameters={"input_type": "passage"}
-        )
+        embeddings = self.embedder.embed(textsToEmbed, "passage")
 
         # Build Pinecone vector format
         vectors = []
         for d, e in zip(data, embeddings):
             vectors.append({
                 "id": d['chunk_id'],
-                "values": e['values'],
-                "metadata": {
-                    'text': d['chunk_text'],
-                    'title': d['title'],
-                    'link': d['link'] if d['link'] is not None else "",
-                    'year': d['year'] if d['year'] is not None else "",
-                    'topic': d['topic'] if d['topic'] is not None else "",
-                    'hierarchy': d['hierarchical_level']
-                }
+                "values": e,
+                "metadata": self.chunkMetadata(d)
             })
 
         return vectors
 
 
-    def insertDataInBatches(self):
-        CHUNK_SIZE = 50
-        # Load the pre-chunked JSON file (already split by text elsewhere)
-        with open("../../Data/ChunkedData/ChunkedData.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+    # Embed the ChunkedData file into a local memory-mapped index (float32 or float16)
+    def buildLocalIndex(self, path=LOCAL_INDEX_PATH, dtype="float32"):
+        # The chunks are streamed from disk on each pass instead of being loaded into a list
+        records = lambda: ({"id": d['chunk_id'], **self.chunkMetadata(d)} for d in iterChunks(CHUNKED_DATA_PATH))
+        return LocalVectorIndex.build(path, records, self.embedder, self.dimension, dtype=dtype)
 
-        # Helper: Chunk a list into smaller batches of 10
-        def batch(iterable, size):
-            for i in range(0, len(iterable), size):
-                yield iterable[i:i + size]
 
-        # Process data in batches
-        for i, batch_data in enumerate(batch(data, CHUNK_SIZE)):     
-            print(f"Processing batch {i+1} / {len(data) // CHUNK_SIZE + 1}...")
+    # Top matches of a single hierarchy level, from whichever backend is active
+    def searchLevel(self, vector, topK, hierarchyLevel):
+        if self.backend == "local":
+            return self.index.search(vector, topK, hierarchy=hierarchyLevel)
 
-            try:
-                # Call addData to process the batch
-                vectors = self.dataEmbedding(batch_data)
+        results = self.index.query(
+            namespace=self.namespace,
+            vector=vector,
+            top_k=topK,
+            include_values=False,
+            include_metadata=True,
+            filter={"hierarchy": hierarchyLevel}
+        )
+        return results.get("matches", [])
 
-                if not vectors:
-                    print(f"Skipping batch {i+1} due to error in adding data.")
-                    continue  # Skip this batch if addData returns no vectors
 
-                # Upsert vectors for the batch
-                self.index.upsert(vectors=vectors, namespace=self.namespace)
-                print(f"Successfully upserted batch {i+1}")
-                
-            except Exception as e:
-                print(f"Error upserting batch {i+1}: {e}")
-                break  
+    # Embed and upsert the ChunkedData file, batchSize chunks per request and workers batches at once
+    def insertDataInBatches(self, batchSize=50, workers=4):
+        self.ingestionCount += 1
 
-        print("Data upserted successfully.")
+        # The local backend has no upsert, its index is rebuilt from the chunked data
+        if self.backend == "local":
+            self.index = self.buildLocalIndex(self.index.path, self.index.matrix.dtype.name)
+            return
 
+        # Stream the pre-chunked file (already split by text elsewhere) through the ingestion pipeline
+        self.upsertChunks(iterChunks(CHUNKED_DATA_PATH), self.loadManifest(), batchSize, workers)
 
-    # Query the index
-    def query(self, queryText, topK=5, targetThreshold=0.6, minimumThreshold=0.2, maxHierarchyLevel=3):
+
+    # Fingerprint of everything stored for a chunk: a change means it must be embedded again
+    @classmethod
+    def chunkFingerprint(cls, d):
+        stored = {"id": d['chunk_id'], **cls.chunkMetadata(d)}
+        return hashlib.sha256(json.dumps(stored, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+    # Local manifest of what is in the index: {chunk_id: fingerprint}
+    def manifestPath(self):
+        return f"../../Data/Cache/manifest-{self.indexName}-{self.namespace}.json"
+
+
+    def loadManifest(self):
+        try:
+            with open(self.manifestPath(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+
+    def saveManifest(self, manifest):
+        os.makedirs(os.path.dirname(self.manifestPath()), exist_ok=True)
+        tmpPath = self.manifestPath() + ".tmp"
+        with open(tmpPath, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(tmpPath, self.manifestPath())
+
+
+    # Upsert chunks and record the fingerprints of those that succeeded in the manifest
+    def upsertChunks(self, chunks, manifest, batchSize=50, workers=4):
+        manifestLock = threading.Lock()
+
+        def onUpserted(batch):
+            with manifestLock:
+                for d in batch:
+                    manifest[d['chunk_id']] = self.chunkFingerprint(d)
+
+        try:
+            result = IngestionPipeline(self, batchSize=batchSize, workers=workers, onUpserted=onUpserted).run(chunks)
+        finally:
+            self.saveManifest(manifest)
+
+        if result["failed"] == 0:
+            print("Data upserted successfully.")
+        else:
+            print("Some batches failed. Run the ingestion again to resume from the checkpoint.")
+        return result
+
+
+    # Delta sync: embed and upsert only new or changed chunks and delete the removed ones
+    def syncIndex(self, batchSize=50, workers=4):
+        self.ingestionCount += 1
+
+        # The local index is small enough to be rebuilt
+        if self.backend == "local":
+            self.index = self.buildLocalIndex(self.index.path, self.index.matrix.dtype.name)
+            return
+
+        manifest = self.loadManifest()
+
+        # First pass: only ids and fingerprints are kept in memory
+        currentIds = set()
+        changedIds = set()
+        for d in iterChunks(CHUNKED_DATA_PATH):
+            currentIds.add(d['chunk_id'])
+            if manifest.get(d['chunk_id']) != self.chunkFingerprint(d):
+                changedIds.add(d['chunk_id'])
+
+        removedIds = [chunkId for chunkId in manifest if chunkId not in currentIds]
+        print(f"{len(changedIds)} new or changed chunks, {len(removedIds)} removed, {len(currentIds) - len(changedIds)} unchanged.")
+
+        for batch in batched(removedIds, 1000):
+            self.index.delete(ids=batch, namespace=self.namespace)
+            for chunkId in batch:
+                del manifest[chunkId]
+        if removedIds:
+            self.saveManifest(manifest)
+
+        # Second pass: stream only the chunks that changed
+        if changedIds:
+            changedChunks = (d for d in iterChunks(CHUNKED_DATA_PATH) if d['chunk_id'] in changedIds)
+            self.upsertChunks(changedChunks, manifest, batchSize, workers)
+
+
+    # Top matches of every hierarchy level up to maxHierarchyLevel with a single search
+    def searchAllLevels(self, vector, topK, maxHierarchyLevel):
+        levels = range(1, maxHierarchyLevel + 1)
+
+        if self.backend == "local":
+            return self.index.searchLevels(vector, topK, levels)
+
+        # One request over all levels with a larger candidate pool, partitioned afterwards
+        poolSize = topK * maxHierarchyLevel * self.candidateMultiplier
+        results = self.index.query(
+            namespace=self.namespace,
+            vector=vector,
+            top_k=poolSize,
+            include_values=False,
+            include_metadata=True,
+            filter={"hierarchy": {"$lte": maxHierarchyLevel}}
+        )
+        matches = results.get("matches", [])
+        matchesByLevel = self.partitionByLevel(matches, topK, levels)
+
+        # A level crowded out of a full pool by better matches of other levels may still have
+        # candidates: query those levels on their own so the selection does not stop there
+        for level in self.crowdedOutLevels(matchesByLevel, len(matches), poolSize, topK):
+            matchesByLevel[level] = self.searchLevel(vector, topK, level)
+
+        return matchesByLevel
+
+
+    # Split matches of a multi-level query by their 'hierarchy' metadata, keeping topK per level
+    @staticmethod
+    def partitionByLevel(matches, topK, levels):
+        matchesByLevel = {level: [] for level in levels}
+        for match in matches:
+            levelMatches = matchesByLevel.get(int(match["metadata"]["hierarchy"]))
+            if levelMatches is not None and len(levelMatches) < topK:
+                levelMatches.append(match)
+
+        return matchesByLevel
+
+
+    # Levels with fewer than topK candidates in a pool that came back full (so it may have been
+    # truncated). When the pool is not full, every level already has all of its matches.
+    @staticmethod
+    def crowdedOutLevels(matchesByLevel, poolCount, poolSize, topK):
+        if poolCount < poolSize:
+            return []
+        return [level for level, levelMatches in matchesByLevel.items() if len(levelMatches) < topK]
+
+
+    # Embed a query, reusing the embedding of a previous identical (normalized) query
+    def embedQuery(self, queryText):
+        return self.embeddingCache.getOrEmbed(
+            queryText,
+            getattr(self.embedder, "model", type(self.embedder).__name__),
+            lambda: self.embedder.embed([queryText], "query")[0]
+        )
+
+
+    # Version of the chunked data the index was built from. It changes when ChunkedData is
+    # rewritten or re-ingested, so anything derived from retrieval results can be invalidated.
+    def corpusVersion(self):
+        return f"{chunkedDataVersion()}-{self.ingestionCount}"
+
+
+    # Retrieve the best matches of the index for a query
+    def retrieve(self, queryText, topK=5, targetThreshold=0.6, minimumThreshold=0.2, maxHierarchyLevel=3):
         # Embed the query once
-        query_embedding = self.pc.inference.embed(
-            model="llama-text-embed-v2",
-            inputs=[queryText],
-            parameters={"input_type": "query"}
-        )[0]["values"]
+        query_embedding = self.embedQuery(queryText)
+
+        # Fetch every level up front (one search) or one level at a time (one search per level)
+        if self.singlePassSearch:
+            matchesByLevel = self.searchAllLevels(query_embedding, topK, maxHierarchyLevel)
+            getMatches = lambda level: matchesByLevel.get(level, [])
+        else:
+            getMatches = lambda level: self.searchLevel(query_embedding, topK, level)
+
+        return self.selectMatches(getMatches, topK, targetThreshold, minimumThreshold, maxHierarchyLevel)
+
 
+    # Hierarchical selection: walk the levels in order, fill topK slots and only let deeper
+    # matches replace results below targetThreshold. getMatches(level) returns a level's matches.
+    @staticmethod
+    def selectMatches(getMatches, topK, targetThreshold, minimumThreshold, maxHierarchyLevel):
+        # Min-heap of (score, insertion order, match): the root is always the lowest scoring
+        # result, and ties are broken by the oldest result as min() over a list would
         finalResults = []
+        insertionOrder = 0
 
         for currentHierachyLevel in range(1, maxHierarchyLevel + 1):
             print(f"Searching hierarchy level {currentHierachyLevel}...")
 
-            results = self.index.query(
-                namespace=self.namespace,
-                vector=query_embedding,
-                top_k=topK,
-                include_values=False,
-                include_metadata=True,
-                filter={"hierarchy": currentHierachyLevel}
-            )
-
-            matches = results.get("matches", [])
+            matches = getMatches(currentHierachyLevel)
             if not matches:
                 print(f"No results at level {currentHierachyLevel}, stopping.")
                 break
@@ -146,31 +371,60 @@ class PineconeHandler:
                 
                 # If we already have topK results above threshold, ignore this
                 if len(finalResults) < topK:
-                    finalResults.append(match)
+                    heapq.heappush(finalResults, (match["score"], insertionOrder, match))
+                    insertionOrder += 1
                     
                 else:
-                    # If we already have topK results, check lowest score of current finalResults list
-                    lowest = min(finalResults, key=lambda x: x["score"])
+                    # If we already have topK results, check lowest score of current finalResults
+                    lowestScore = finalResults[0][0]
 
                     # Only replace the lowest scoring match if the new match is better and out of threshold scope
-                    if match["score"] > lowest["score"] and lowest["score"] < targetThreshold:
-                        finalResults.remove(lowest)
-                        finalResults.append(match)
+                    if match["score"] > lowestScore and lowestScore < targetThreshold:
+                        heapq.heapreplace(finalResults, (match["score"], insertionOrder, match))
+                        insertionOrder += 1
 
             # Stop if all finalResults are above threshold and we have enough
-            if len(finalResults) == topK and all(r["score"] >= targetThreshold for r in finalResults):
+            if len(finalResults) == topK and finalResults[0][0] >= targetThreshold:
                 print("All required results found. Stopping.")
                 break
             else:
                 print("Not good enough results yet, checking deeper hierarchy...")
 
         # Sort results by score descending
-        finalResults.sort(key=lambda x: x["score"], reverse=True)
+        finalResults = [match for _, _, match in sorted(finalResults, key=lambda x: (-x[0], x[1]))]
         
         # Filter by minimum accepted threshold values
         finalResults = [x for x in finalResults if x["score"] >= minimumThreshold]
 
-        # Build response
+        finalResults = PineconeHandler.collapseNested(finalResults)
+
+        # Print final results
+        print("\nFinal Top Matches:")
+        for match in finalResults:
+            print(f"Id: {match['id']}")
+            print(f"Score: {match['score']:.4f}")
+            print(f"Hierarchy: {match['metadata']['hierarchy']}")
+            print(f"Text: {match['metadata']['text']}")
+            print("-" * 50)
+
+        return finalResults
+
+
+    # Drop level 3 windows whose level 2 section was also selected: the window's text is part
+    # of the section, so keeping both would repeat it in the context. A level 2 section is kept
+    # even when its parent abstract was selected, since the abstract does not contain its text.
+    @staticmethod
+    def collapseNested(finalResults):
+        selectedIds = {match["id"] for match in finalResults}
+        return [
+            match for match in finalResults
+            if int(match["metadata"].get("hierarchy", 0)) != 3 or match["metadata"].get("parent") not in selectedIds
+        ]
+
+
+    # Build the articles context given to the LLM from retrieved matches
+    @staticmethod
+    def buildContext(finalResults):
         responseBuilder = ""
         for match in finalResults:
             responseBuilder += f"Title: {match['metadata'].get('title')}\n"
@@ -185,19 +439,16 @@ class PineconeHandler:
                 
             responseBuilder += f"Text: {match['metadata'].get('text')}\n\n"
 
-        # Print final results
-        print("\nFinal Top Matches:")
-        for match in finalResults:
-            print(f"Id: {match['id']}")
-            print(f"Score: {match['score']:.4f}")
-            print(f"Hierarchy: {match['metadata']['hierarchy']}")
-            print(f"Text: {match['metadata']['text']}")
-            print("-" * 50)
-
         return responseBuilder
+
+
+    # Query the index
+    def query(self, queryText, topK=5, targetThreshold=0.6, minimumThreshold=0.2, maxHierarchyLevel=3):
+        finalResults = self.retrieve(queryText, topK, targetThreshold, minimumThreshold, maxHierarchyLevel)
+        return self.buildContext(finalResults)
         
 
 
 if __name__ == "__main__":
     p = PineconeHandler()
-    p.insertDataInBatches()
\ No newline at end of file
+    p.syncIndex()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+from EmbeddingCache import normalizeQuery
+
+# Same logger configured in server/utils/logger.py
+logger = logging.getLogger("app_logger")
+
+
+def hashText(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cosineSimilarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    # Cache of LLM answers keyed on (model, context prompt hash, conversation history hash, normalized question, retrieved chunk ids)
+    # maxSize: maximum number of answers kept, least recently used ones are evicted first
+    # similarityThreshold: when set, a question whose embedding is at least this similar to a cached
+    #   question with the same model, prompt, conversation history and retrieved chunks reuses its answer (near-duplicate mode)
+    def __init__(self, maxSize=512, similarityThreshold=None):
+        self.maxSize = maxSize
+        self.similarityThreshold = similarityThreshold
+
+        self.entries = OrderedDict()  # key -> (contextKey, queryEmbedding, response)
+        self.keysByContext = {}       # contextKey -> set of keys, used by the near-duplicate lookup
+        self.corpusVersion = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    # history: conversation history the question was asked after ("" outside a conversation), so an
+    # answer written for one conversation is never served, even as a near-duplicate, to another
+    @staticmethod
+    def contextKey(model, contextPrompt, chunkIds, history=""):
+        return hashText(f"{model}\x00{hashText(contextPrompt)}\x00{hashText(history)}\x00{','.join(sorted(chunkIds))}")
+
+
+    @staticmethod
+    def key(contextKey, question):
+        return hashText(f"{contextKey}\x00{normalizeQuery(question)}")
+
+
+    # Drop every answer when the indexed corpus changed since they were cached
+    def checkCorpusVersion(self, corpusVersion):
+        if corpusVersion != self.corpusVersion:
+            if self.entries:
+                logger.info("Chunked data changed, clearing the response cache.")
+            self.entries.clear()
+            self.keysByContext.clear()
+            self.corpusVersion = corpusVersion
+
+
+    def get(self, model, contextPrompt, question, chunkIds, corpusVersion, queryEmbedding=None, history=""):
+        contextKey = self.contextKey(model, contextPrompt, chunkIds, history)
+        key = self.key(contextKey, question)
+
+        with self.lock:
+            self.checkCorpusVersion(corpusVersion)
+
+            if key not in self.entries and self.similarityThreshold is not None and queryEmbedding is not None:
+                key = self.findNearDuplicate(contextKey, queryEmbedding)
+
+            if key is None or key not in self.entries:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][2]
+
+
+    # Most similar cached question among those answered with the same context
+    def findNearDuplicate(self, contextKey, queryEmbedding):
+        bestKey, bestScore = None, self.similarityThreshold
+        for key in self.keysByContext.get(contextKey, ()):
+            cachedEmbedding = self.entries[key][1]
+            if cachedEmbedding is None:
+                continue
+            score = cosineSimilarity(queryEmbedding, cachedEmbedding)
+            if score >= bestScore:
+                bestKey, bestScore = key, score
+        return bestKey
+
+
+    def put(self, model, contextPrompt, question, chunkIds, corpusVersion, response, queryEmbedding=None, history=""):
+        if self.maxSize <= 0:
+            return
+
+        contextKey = self.contextKey(model, contextPrompt, chunkIds, history)
+        key = self.key(contextKey, question)
+
+        with self.lock:
+            self.checkCorpusVersion(corpusVersion)
+
+            self.entries[key] = (contextKey, queryEmbedding, response)
+            self.entries.move_to_end(key)
+            self.keysByContext.setdefault(contextKey, set()).add(key)
+
+            while len(self.entries) > self.maxSize:
+                evictedKey, (evictedContext, _, _) = self.entries.popitem(last=False)
+                contextKeys = self.keysByContext[evictedContext]
+                contextKeys.discard(evictedKey)
+                if not contextKeys:
+                    del self.keysByContext[evictedContext]
+
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.keysByContext.clear()
+
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries)
+            }
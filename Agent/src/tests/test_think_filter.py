@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+
+from LLMClient import LLMClient, ThinkFilter
+
+# ThinkFilter must give the same text streamed token by token as cleanResponse on the whole response
+#
+#   python -m unittest discover tests
+
+
+def streamTokens(tokens):
+    thinkFilter = ThinkFilter()
+    return "".join(thinkFilter.feed(token) for token in tokens) + thinkFilter.flush()
+
+
+def splitEvery(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class ThinkFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        # cleanResponse does not need the TogetherAI client
+        self.llmClient = LLMClient.__new__(LLMClient)
+
+    def assertMatchesCleanResponse(self, text):
+        expected = self.llmClient.cleanResponse(text)
+        for size in (1, 2, 3, 7, len(text)):
+            with self.subTest(text=text, tokenSize=size):
+                self.assertEqual(streamTokens(splitEvery(text, size)), expected)
+
+    def testClosedSectionIsRemoved(self):
+        self.assertMatchesCleanResponse("<think>Sleep question, answer briefly.</think>\n\nAdults need 7 to 9 hours.")
+
+    def testTextAroundSections(self):
+        self.assertMatchesCleanResponse("Short answer: <think>a</think>7 to 9 hours<think>b</think> per night.")
+
+    def testUnclosedSectionIsKept(self):
+        self.assertMatchesCleanResponse("<think>The stream ended before the reasoning was closed")
+
+    def testUnclosedSectionAfterAnswer(self):
+        self.assertMatchesCleanResponse("<think>a</think>Adults need 7 to 9 hours. <think>cut off <thi")
+
+    def testPartialTagAtTheEnd(self):
+        self.assertMatchesCleanResponse("Adults need 7 to 9 hours. <thi")
+
+
+if __name__ == "__main__":
+    unittest.main()
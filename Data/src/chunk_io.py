@@ -0,0 +1,93 @@
+import argparse
+import gzip
+import json
+from collections import Counter
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def open_text(path, mode):
+    """Abre ficheiros de texto, comprimidos com gzip se terminarem em .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_chunks(path, chunks):
+    """Escreve os chunks à medida que são gerados.
+
+    .jsonl / .jsonl.gz: um chunk JSON por linha (recomendado).
+    .json: array JSON, escrito elemento a elemento (formato antigo).
+    Devolve o número de chunks escritos.
+    """
+    count = 0
+    with open_text(path, "w") as f:
+        if path.endswith(".json"):
+            f.write("[\n")
+            for chunk in chunks:
+                if count:
+                    f.write(",\n")
+                f.write(json.dumps(chunk, ensure_ascii=False))
+                count += 1
+            f.write("\n]\n")
+        else:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def iter_chunks(path):
+    """Lê os chunks um a um, em JSON Lines (.jsonl, .jsonl.gz) ou array JSON (.json)."""
+    if path.endswith(".json"):
+        with open(path, "rb") as f:
+            if ijson is not None:
+                yield from ijson.items(f, "item", use_float=True)
+            else:
+                yield from json.load(f)
+        return
+
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunk_stats(path):
+    """Estatísticas de um ficheiro de chunks, calculadas sem o carregar todo para memória."""
+    total = 0
+    characters = 0
+    papers = set()
+    levels = Counter()
+    topics = Counter()
+
+    for chunk in iter_chunks(path):
+        total += 1
+        characters += len(chunk.get("chunk_text") or "")
+        papers.add(chunk["chunk_id"].split("Chunk")[0])
+        levels[chunk.get("hierarchical_level")] += 1
+        topics[chunk.get("topic")] += 1
+
+    return {
+        "chunks": total,
+        "papers": len(papers),
+        "avg_chars": characters / total if total else 0,
+        "levels": dict(levels),
+        "topics": dict(topics),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estatísticas de um ficheiro de chunks.")
+    parser.add_argument("path", nargs="?", default="../ChunkedData/ChunkedData.jsonl")
+    args = parser.parse_args()
+
+    stats = chunk_stats(args.path)
+    print(f"Chunks: {stats['chunks']}")
+    print(f"Papers: {stats['papers']}")
+    print(f"Média de caracteres por chunk: {stats['avg_chars']:.0f}")
+    print(f"Por nível: {stats['levels']}")
+    print(f"Por tópico: {stats['topics']}")
@@ -1,13 +1,34 @@
+import argparse
 import json
-import spacy
-from transformers import AutoTokenizer
+import re
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from chunk_io import write_chunks
+from keyword_matcher import KeywordMatcher
 
-# Carregar modelos
-nlp = spacy.load("en_core_sci_scibert")
-tokenizer = AutoTokenizer.from_pretrained("BAAI/bge-small-en")
+SPACY_MODEL = "en_core_sci_scibert"
+TOKENIZER_MODEL = "BAAI/bge-small-en"
 
-# Função para dividir texto em chunks
+# Modelos carregados uma vez por processo (no processo principal e em cada worker)
+nlp = None
+tokenizer = None
+
+def load_models():
+    global nlp, tokenizer
+    if nlp is None:
+        import spacy
+        from transformers import AutoTokenizer
+
+        nlp = spacy.load(SPACY_MODEL)
+        tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_MODEL)
+    return nlp, tokenizer
+
+
+# Função para dividir texto em chunks (versão original, um texto e várias tokenizações de cada vez)
 def split_into_chunks(text, max_length=150, max_tokens=512):
+    nlp, tokenizer = load_models()
     doc = nlp(text)
     chunks = []
     current_chunk = []
@@ -54,19 +75,126 @@ def split_into_chunks(text, max_length=150, max_tokens=512):
     return final_chunks
 
 
-def process_json(input_data):
-    output = []
-    paper_count = 1074  # começa em 1, pode começar em 0 se preferires
+# Mesma divisão que split_into_chunks, mas com os tokens do texto inteiro calculados uma só vez:
+# o número de tokens de qualquer frase ou palavra sai dos offsets, sem voltar a tokenizar.
+def split_doc_into_chunks(doc, token_starts, max_length=150, max_tokens=512):
+
+    # Número de tokens que começam no intervalo de caracteres [start, end)
+    def count_tokens(start, end):
+        return bisect_left(token_starts, end) - bisect_left(token_starts, start)
+
+    chunks = []  # (texto, número de tokens)
+    current_chunk = []
+    current_length = 0
+
+    for sent in doc.sents:
+        raw = sent.text
+        sent_text = raw.strip()
+        if not sent_text:
+            continue
+        start = sent.start_char + (len(raw) - len(raw.lstrip()))
+        sent_tokens = count_tokens(start, start + len(sent_text))
+
+        if sent_tokens > max_length:
+            sub_chunk = []
+            sub_length = 0
+            for word in re.finditer(r"\S+", sent_text):
+                word_tokens = count_tokens(start + word.start(), start + word.end())
+                if sub_length + word_tokens <= max_length:
+                    sub_chunk.append(word.group())
+                    sub_length += word_tokens
+                else:
+                    if sub_chunk:
+                        chunks.append((" ".join(sub_chunk), sub_length))
+                    sub_chunk = [word.group()]
+                    sub_length = word_tokens
+            if sub_chunk:
+                chunks.append((" ".join(sub_chunk), sub_length))
+        else:
+            if current_length + sent_tokens <= max_length and current_length + sent_tokens <= max_tokens:
+                current_chunk.append(sent_text)
+                current_length += sent_tokens
+            else:
+                if current_chunk:
+                    chunks.append((" ".join(current_chunk), current_length))
+                current_chunk = [sent_text]
+                current_length = sent_tokens
+
+    if current_chunk:
+        chunks.append((" ".join(current_chunk), current_length))
+
+    # Verificar se o número total de tokens não excede o limite
+    return [chunk for chunk, length in chunks if length <= max_tokens]
+
+
+# Divide uma lista de abstracts em chunks com nlp.pipe e uma única chamada ao tokenizer por lote.
+# Gera, pela mesma ordem, a lista de chunks de cada abstract (None se deu erro).
+def chunk_abstracts(texts, batch_size=64, n_process=1, max_length=150, max_tokens=512):
+    nlp, tokenizer = load_models()
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+
+    for batch_start in range(0, len(texts), batch_size):
+        batch = texts[batch_start:batch_start + batch_size]
+        encodings = tokenizer(batch, add_special_tokens=False, return_offsets_mapping=True)
+
+        for offsets in encodings["offset_mapping"]:
+            doc = next(docs)
+            try:
+                token_starts = [start for start, end in offsets]
+                yield split_doc_into_chunks(doc, token_starts, max_length, max_tokens)
+            except Exception as e:
+                print(f"Ignorar entrada com erro: {e}")
+                yield None
+
+
+# Trabalho de cada processo: um shard contíguo de abstracts
+def chunk_shard(texts, batch_size):
+    return list(chunk_abstracts(texts, batch_size=batch_size))
+
+
+# Listas de chunks de cada abstract, pela ordem do input, calculadas em shards por vários processos.
+# Só há workers * 2 shards em curso de cada vez, para a memória não crescer com o input.
+def iter_chunk_lists(texts, workers=1, batch_size=64, n_process=1):
+    if workers <= 1 or len(texts) <= batch_size:
+        yield from chunk_abstracts(texts, batch_size=batch_size, n_process=n_process)
+        return
 
+    shard_size = max(batch_size, -(-len(texts) // (workers * 4)))
+    shards = [(i, i + shard_size) for i in range(0, len(texts), shard_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for start, end in shards:
+            in_flight.append(executor.submit(chunk_shard, texts[start:end], batch_size))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+# Gera os chunks um a um, prontos a escrever em streaming.
+# Com um KeywordMatcher, cada chunk leva também os tópicos das palavras-chave que contém (keyword_topics).
+def iter_process_json(input_data, first_paper_id=1074, workers=1, batch_size=64, n_process=1, matcher=None):
+    # Entradas sem abstract válido são ignoradas (como os erros da versão original)
+    valid = []
     for item in input_data:
-        try:
-            chunks = split_into_chunks(item["abstract"])
-        except Exception as e:
-            print(f"Ignorar entrada com erro: {e}")
+        abstract = item.get("abstract")
+        if isinstance(abstract, str):
+            valid.append(item)
+        else:
+            print(f"Ignorar entrada com erro: abstract inválido em '{item.get('title')}'")
+
+    texts = [item["abstract"] for item in valid]
+
+    # Os ids são atribuídos pela ordem do input, por isso não dependem do número de processos
+    paper_count = first_paper_id
+
+    for item, chunks in zip(valid, iter_chunk_lists(texts, workers, batch_size, n_process)):
+        if chunks is None:
             continue
 
         for idx, chunk in enumerate(chunks):
-            output.append({
+            chunk_data = {
                 "chunk_id": f"Paper{paper_count}Chunk{idx}",
                 "chunk_text": chunk,
                 "title": item["title"],
@@ -74,20 +202,62 @@ def process_json(input_data):
                 "year": item["year"],
                 "topic": item["topic"],
                 "hierarchical_level": 1
-            })
+            }
+            if matcher is not None:
+                chunk_data["keyword_topics"] = sorted(matcher.topics(chunk))
+            yield chunk_data
 
         paper_count += 1  # incrementa o número do paper depois de processar os chunks
 
-    return output
 
+def process_json(input_data, first_paper_id=1074, workers=1, batch_size=64, n_process=1, matcher=None):
+    return list(iter_process_json(input_data, first_paper_id, workers, batch_size, n_process, matcher))
+
+
+# Compara abstracts/s da versão original (split_into_chunks) com a versão em lote
+def benchmark(input_data, sample_size, workers, batch_size):
+    sample = [item for item in input_data if isinstance(item.get("abstract"), str)][:sample_size]
+    texts = [item["abstract"] for item in sample]
+    load_models()
+
+    start = time.perf_counter()
+    for text in texts:
+        split_into_chunks(text)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    process_json(sample, workers=workers, batch_size=batch_size)
+    after = time.perf_counter() - start
+
+    print(f"Original: {len(texts) / before:.1f} abstracts/s")
+    print(f"Em lote ({workers} processo(s), batch {batch_size}): {len(texts) / after:.1f} abstracts/s")
 
 
-# Exemplo de uso
 if __name__ == "__main__":
-    with open("../JSON/FirstLevel.json", "r") as infile:
+    parser = argparse.ArgumentParser(description="Divide abstracts em chunks.")
+    parser.add_argument("--input", default="../JSON/FirstLevel.json")
+    parser.add_argument("--output", default="../ChunkedData/ChunkedData.jsonl",
+                        help="ficheiro de saída: .jsonl, .jsonl.gz (comprimido) ou .json (array)")
+    parser.add_argument("--first-paper-id", type=int, default=1074)
+    parser.add_argument("--workers", type=int, default=1, help="processos, cada um com um shard de abstracts")
+    parser.add_argument("--batch-size", type=int, default=64, help="abstracts por chamada a nlp.pipe e ao tokenizer")
+    parser.add_argument("--n-process", type=int, default=1, help="n_process do nlp.pipe quando --workers é 1")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="mede abstracts/s antes e depois com N abstracts")
+    parser.add_argument("--tag-topics", action="store_true", help="acrescenta a cada chunk os tópicos das suas palavras-chave")
+    parser.add_argument("--keywords-file", help="tira as palavras-chave das pesquisas deste ficheiro (p.e. ../JSON/keywords.json)")
+    args = parser.parse_args()
+
+    with open(args.input, "r") as infile:
         data = json.load(infile)
 
-    processed = process_json(data)
+    if args.benchmark:
+        benchmark(data, args.benchmark, args.workers, args.batch_size)
+    else:
+        matcher = None
+        if args.tag_topics:
+            matcher = KeywordMatcher.from_keywords_file(args.keywords_file) if args.keywords_file else KeywordMatcher()
 
-    with open("../ChunkedData/Try.json", "w") as outfile:
-        json.dump(processed, outfile, indent=4)
+        # Os chunks são escritos à medida que são gerados, sem os acumular em memória
+        chunks = iter_process_json(data, args.first_paper_id, args.workers, args.batch_size, args.n_process, matcher)
+        count = write_chunks(args.output, chunks)
+        print(f"{count} chunks guardados em '{args.output}'")
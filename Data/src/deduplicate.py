@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+import numpy as np
+from chunk_io import iter_chunks, write_chunks
+
+# Valores que os scripts de recolha usam quando um campo não existe
+MISSING_VALUES = {
+    "", "no doi available", "doi unavailable", "no link available", "no pdf link available",
+    "abstract unavailable", "no title available", "title unavailable", "no date available",
+    "no year available", "authors unavailable",
+}
+
+# MinHash dos títulos: NUM_PERM permutações em BANDS bandas de ROWS linhas cada (LSH)
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+TITLE_SIMILARITY = 0.8        # Jaccard mínimo entre os títulos de dois registos sem identificadores
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def value(record, field):
+    """Valor de um campo, ou None quando falta ou é um dos textos de "indisponível"."""
+    v = record.get(field)
+    if v is None:
+        return None
+    if isinstance(v, str) and v.strip().lower() in MISSING_VALUES:
+        return None
+    return v
+
+
+def normalize_doi(doi):
+    if not doi:
+        return None
+    doi = doi.strip().lower()
+    doi = re.sub(r"^(https?://)?(dx\.)?doi\.org/", "", doi)
+    doi = re.sub(r"^doi:\s*", "", doi)
+    return doi or None
+
+
+def extract_pmid(record):
+    """PMID do registo (campo pmid ou link do PubMed)."""
+    if value(record, "pmid"):
+        return str(record["pmid"])
+    for field in ("link", "pdf_link"):
+        match = re.search(r"pubmed\.ncbi\.nlm\.nih\.gov/(\d+)", str(value(record, field) or ""))
+        if match:
+            return match.group(1)
+    return None
+
+
+def normalize_title(title):
+    """Título sem acentos, pontuação nem diferenças de maiúsculas e espaços."""
+    if not title:
+        return None
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c)).lower()
+    title = re.sub(r"[^a-z0-9]+", " ", title).strip()
+    return title or None
+
+
+def title_shingles(title):
+    if len(title) <= SHINGLE_SIZE:
+        return {title}
+    return {title[i:i + SHINGLE_SIZE] for i in range(len(title) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class MinHasher:
+    """Assinaturas MinHash com NUM_PERM funções de hash (a * x + b) mod p, calculadas com NumPy."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, shingles):
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        )
+        # a, b e os hashes têm 32 bits, por isso a * x + b cabe em 64 bits sem overflow
+        return ((self.a * hashes + self.b) % np.uint64(MERSENNE_PRIME)).min(axis=1)
+
+
+class UnionFind:
+    """Grupos de registos duplicados. Dois grupos com DOIs (ou PMIDs) diferentes nunca se juntam."""
+
+    def __init__(self, records):
+        self.parent = list(range(len(records)))
+        self.dois = [{normalize_doi(value(r, "doi"))} - {None} for r in records]
+        self.pmids = [{extract_pmid(r)} - {None} for r in records]
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return True
+        if (self.dois[i] and self.dois[j] and self.dois[i] != self.dois[j]) or \
+                (self.pmids[i] and self.pmids[j] and self.pmids[i] != self.pmids[j]):
+            return False
+        if i > j:
+            i, j = j, i
+        # A raiz é sempre o registo que aparece primeiro, para a ordem do resultado ser estável
+        self.parent[j] = i
+        self.dois[i] |= self.dois[j]
+        self.pmids[i] |= self.pmids[j]
+        return True
+
+
+def find_duplicates(records):
+    """Agrupa os registos duplicados em tempo quase linear.
+
+    1. DOI, PMID e título normalizado: registos com a mesma chave são o mesmo artigo.
+    2. Registos sem DOI nem PMID: MinHash dos títulos com LSH, e os pares candidatos só se
+       juntam se a semelhança de Jaccard dos títulos for pelo menos TITLE_SIMILARITY.
+    Devolve o UnionFind e o número de junções por tipo de chave.
+    """
+    groups = UnionFind(records)
+    merges = defaultdict(int)
+
+    first_by_key = {}
+    for i, record in enumerate(records):
+        keys = [
+            ("doi", normalize_doi(value(record, "doi"))),
+            ("pmid", extract_pmid(record)),
+            ("title", normalize_title(value(record, "title"))),
+        ]
+        for kind, key in keys:
+            if key is None:
+                continue
+            j = first_by_key.setdefault((kind, key), i)
+            if j != i and groups.find(i) != groups.find(j) and groups.union(j, i):
+                merges[kind] += 1
+
+    hasher = MinHasher()
+    shingles = {}
+    buckets = defaultdict(list)
+    for i, record in enumerate(records):
+        title = normalize_title(value(record, "title"))
+        if title is None or normalize_doi(value(record, "doi")) or extract_pmid(record):
+            continue
+        shingles[i] = title_shingles(title)
+
+    # Os registos sem identificadores são comparados com todos os títulos
+    for i, record in enumerate(records):
+        title = normalize_title(value(record, "title"))
+        if title is None:
+            continue
+        shingle_set = shingles.get(i) or title_shingles(title)
+        signature = hasher.signature(shingle_set)
+        for band in range(BANDS):
+            bucket = buckets[(band, signature[band * ROWS:(band + 1) * ROWS].tobytes())]
+            for j in bucket:
+                if (i in shingles or j in shingles) and groups.find(i) != groups.find(j):
+                    other = shingles.get(j) or title_shingles(normalize_title(value(records[j], "title")))
+                    if jaccard(shingle_set, other) >= TITLE_SIMILARITY and groups.union(j, i):
+                        merges["minhash"] += 1
+            bucket.append(i)
+
+    return groups, dict(merges)
+
+
+def merge_records(group):
+    """Junta os registos de um grupo num só.
+
+    O registo principal é o que tem o abstract mais longo; os campos que lhe faltam vêm dos
+    outros. topic é o do registo principal e topics lista todos os tópicos, por ordem.
+    """
+    primary = max(group, key=lambda r: len(value(r, "abstract") or ""))
+    merged = {field: v for field, v in primary.items()}
+
+    for record in group:
+        for field, v in record.items():
+            if value(merged, field) is None and value(record, field) is not None:
+                merged[field] = v
+
+    if value(merged, "link") is None and value(merged, "pdf_link") is not None:
+        merged["link"] = merged["pdf_link"]
+
+    topics = []
+    sources = []
+    for record in group:
+        for topic in record.get("topics") or [record.get("topic")]:
+            if topic and topic not in topics:
+                topics.append(topic)
+        for source in record.get("sources") or [record.get("source")]:
+            if source and source not in sources:
+                sources.append(source)
+
+    merged["topics"] = topics
+    merged["sources"] = sources
+    merged.pop("source", None)
+    return merged
+
+
+def deduplicate(records):
+    """Registos sem duplicados, pela ordem em que cada artigo aparece pela primeira vez."""
+    groups, merges = find_duplicates(records)
+
+    members = defaultdict(list)
+    for i, record in enumerate(records):
+        members[groups.find(i)].append(record)
+
+    return [merge_records(members[root]) for root in sorted(members)], merges
+
+
+def load_sources(paths):
+    """Lê os ficheiros de cada fonte (JSON ou JSON Lines) e marca cada registo com a fonte."""
+    records = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Ignorar '{path}': ficheiro não encontrado")
+            continue
+        source = os.path.basename(path).split(".")[0]
+        for record in iter_chunks(path):
+            records.append({**record, "source": source})
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove artigos duplicados entre fontes e pesquisas.")
+    parser.add_argument("--inputs", nargs="+", default=[
+        "../JSON/pubmed_abstracts.json",
+        "../JSON/semantic_scholar_abstracts.json",
+        "../JSON/google_scholar_papers.json",
+    ])
+    parser.add_argument("--output", default="../JSON/papers_deduplicated.json")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = load_sources(args.inputs)
+    papers, merges = deduplicate(records)
+    write_chunks(args.output, papers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(records)} registos -> {len(papers)} artigos ({len(records) - len(papers)} duplicados) em {elapsed:.2f}s")
+    print(f"Junções por chave: {merges}")
+    print(f"Artigos guardados em '{args.output}'")
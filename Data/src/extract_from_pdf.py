@@ -1,36 +1,33 @@
 import re
 from pdfminer.high_level import extract_text
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
 import os
-import requests
+import io
+import json
+import hashlib
+import argparse
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from text_cleaning import TextCleaner
+from keyword_matcher import KEYWORDS_BY_TOPIC, matcher_for_keywords
+from summarization_client import SummarizationClient
 from dotenv import load_dotenv
 load_dotenv()
 
-API_URL = "https://api-inference.huggingface.co/models/facebook/bart-large-cnn"
-HEADERS = {"Authorization": f"Bearer {os.getenv('HF_API_KEY')}"}
+# Manifesto com o hash de cada PDF já extraído; mudar CACHE_VERSION quando a limpeza mudar
+MANIFEST_PATH = "../Cache/pdf_text_manifest.json"
+CACHE_VERSION = 1
+PAGES_PER_RANGE = 20
 
+# Limpeza numa só passagem, com as expressões regulares compiladas uma vez
+CLEANER = TextCleaner()
 
-keywords = [
-    # Álcool & Drogas
-    "alcohol", "binge drinking", "alcoholism", "liver disease", "addiction", 
-    "drugs", "substance abuse", "opioids", "cocaine", "cannabis", "overdose", "rehabilitation",
 
-    # Saúde & Higiene Pública
-    "health", "mental health", "physical health", "immune system", "nutrition", 
-    "fitness", "exercise", "hygiene", "public hygiene", "infection control", "disease prevention",
-
-    # Trabalho & Ergonomia
-    "work", "occupational health", "workplace safety", "job stress", "burnout", 
-    "productivity", "work-life balance", "ergonomics", "posture", "back pain", "chronic pain",
-
-    # Sono & Qualidade de Vida
-    "sleep", "sleep quality", "circadian rhythm", "REM sleep", "sleep deprivation", 
-    "insomnia", "melatonin", "sleep hygiene", "cognitive performance", "fatigue", "alertness",
-
-    # Tabagismo & Saúde Pulmonar
-    "tobacco", "nicotine", "smoking", "cigarettes", "vaping", "smoking cessation", 
-    "lungs", "respiratory health", "COPD", "lung cancer", "breathing exercises"
-]
+# Lista de palavras-chave (agrupadas por tópico em keyword_matcher.py)
+keywords = [keyword for topic_keywords in KEYWORDS_BY_TOPIC.values() for keyword in topic_keywords]
 
 
 def extract_text_from_pdf(pdf_path):
@@ -83,6 +80,10 @@ def remove_titles_and_subtitles(text):
 
 def clean_text(text):
     """Remove elementos irrelevantes como cabeçalhos, rodapés, referências, links, títulos e espaços extras."""
+    return CLEANER.clean(text)
+
+def clean_text_multipass(text):
+    """Versão original de clean_text, com uma passagem pelo texto por regra (referência para o benchmark)."""
     text = remove_page_numbers_and_headers(text)
     text = remove_bibliographic_references(text)
     text = remove_titles_and_subtitles(text)
@@ -102,84 +103,206 @@ def clean_text(text):
 
 def filter_relevant_text(text, keywords):
     """Mantém apenas frases que contenham palavras-chave relevantes."""
-    sentences = text.split(". ")
-    relevant_sentences = [s for s in sentences if any(kw.lower() in s.lower() for kw in keywords)]
-    return "\n ".join(relevant_sentences)
-
-
-def summarize_text(text, max_retries=5):
-    payload = {
-        "inputs": text,
-        "parameters": {"max_length": 200, "min_length": 50, "do_sample": False},
-    }
-    retries = 0
-    while retries < max_retries:
-        response = requests.post(API_URL, headers=HEADERS, json=payload)
-
-        if response.status_code == 429:  # Too Many Requests
-            wait_time = 2 ** retries  # 2, 4, 8, 16...
-            print(f"Rate limit atingido! A aguardar {wait_time}s antes de tentar novamente...")
-        
-        elif response.status_code == 503:  # Service Unavailable
-            wait_time = 10  
-            print(f"Serviço temporariamente indisponível. A aguardar {wait_time}s antes de tentar novamente...")
+    return matcher_for_keywords(tuple(keywords)).filter_relevant_text(text)
 
-        else:
-            if response.status_code != 200:
-                return f"Erro HTTP {response.status_code}: {response.text}"
 
-            try:
-                result = response.json()
-                if isinstance(result, list):
-                    return result[0].get("summary_text", "Erro: Resumo não encontrado.")
-                return f"Erro: {result.get('error', 'Resposta inválida')}"
-            except requests.exceptions.JSONDecodeError:
-                return "Erro: Resposta vazia ou inválida da API."
-
-        time.sleep(wait_time)
-        retries += 1
+# Cliente de resumos partilhado, criado na primeira vez que é preciso
+summarization_client = None
 
-    return "Erro: Número máximo de tentativas atingido. Tenta mais tarde."
+def get_summarization_client():
+    global summarization_client
+    if summarization_client is None:
+        summarization_client = SummarizationClient()
+    return summarization_client
 
+def summarize_text(text):
+    """Resume um texto (com cache em disco e novas tentativas, ver SummarizationClient)."""
+    summary = get_summarization_client().summarize(text)
+    if summary is None:
+        return "Erro: Não foi possível obter o resumo. Tenta mais tarde."
+    return summary
 
 
-
-def process_pdf(pdf_path):
-    """Processa o PDF inteiro: extrai, limpa, filtra e resume."""
+def process_pdf(pdf_path, summarize=False):
+    """Processa o PDF inteiro: extrai, limpa e, com summarize, filtra e resume."""
     raw_text = extract_text_from_pdf(pdf_path)
-    cleaned_text = clean_text(raw_text) 
-
-    #filtered_text = filter_relevant_text(cleaned_text, keywords)
-    
-    # final_text = []
-    # for line in filtered_text.split("\n"):  
-    #     if len(line.split()) >= 30: 
-    #         summarized_line = summarize_text(line)
-    #         final_text.append(summarized_line)
-    
-    return cleaned_text
-    return "\n".join(final_text)
-
+    cleaned_text = clean_text(raw_text)
+
+    if not summarize:
+        return cleaned_text
+    return summarize_cleaned_text(cleaned_text)
+
+
+def summarize_cleaned_text(cleaned_text):
+    """Filtra as frases relevantes de um texto já limpo e resume as linhas longas."""
+    filtered_text = filter_relevant_text(cleaned_text, keywords)
+
+    # As linhas longas são resumidas em batches e em paralelo, e as já resumidas vêm da cache
+    lines = [line for line in filtered_text.split("\n") if len(line.split()) >= 30]
+    summaries = get_summarization_client().summarize_many(lines)
+    return "\n".join(summary for summary in summaries if summary is not None)
+
+
+
+def iter_page_ranges(pdf_path, pages_per_range=PAGES_PER_RANGE):
+    """Extrai o texto do PDF em blocos de pages_per_range páginas, sem ter o texto todo em memória.
+
+    Gera (texto do bloco, número de páginas do bloco). O texto é o mesmo de extract_text.
+    """
+    with open(pdf_path, "rb") as fp:
+        resource_manager = PDFResourceManager(caching=True)
+        output = io.StringIO()
+        device = TextConverter(resource_manager, output, laparams=LAParams())
+        interpreter = PDFPageInterpreter(resource_manager, device)
+        pages = 0
+        try:
+            for page in PDFPage.get_pages(fp, caching=True):
+                interpreter.process_page(page)
+                pages += 1
+                if pages == pages_per_range:
+                    yield output.getvalue(), pages
+                    output.seek(0)
+                    output.truncate(0)
+                    pages = 0
+            if pages:
+                yield output.getvalue(), pages
+        finally:
+            device.close()
+
+
+def process_pdf_to_file(pdf_path, output_path, pages_per_range=PAGES_PER_RANGE):
+    """Extrai e limpa o PDF bloco a bloco, escrevendo o texto diretamente no ficheiro de saída.
+
+    Devolve (número de páginas, segundos). Corre num processo do pool.
+    """
+    start = time.perf_counter()
+    total_pages = 0
+    tmp_path = output_path + ".part"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        first = True
+        for text, pages in iter_page_ranges(pdf_path, pages_per_range):
+            total_pages += pages
+            cleaned_text = clean_text(text)
+            if not cleaned_text:
+                continue
+            if not first:
+                f.write(" ")
+            f.write(cleaned_text)
+            first = False
+
+    os.replace(tmp_path, output_path)
+    return total_pages, time.perf_counter() - start
+
+
+def summarize_file(output_path):
+    """Substitui o texto extraído de um PDF pelo seu resumo (como process_pdf com summarize=True).
+
+    Corre no processo principal, para todos os PDFs partilharem o cliente de resumos e a sua cache.
+    """
+    with open(output_path, "r", encoding="utf-8") as f:
+        summary = summarize_cleaned_text(f.read())
+
+    tmp_path = output_path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(summary)
+    os.replace(tmp_path, output_path)
+
+
+def file_hash(path):
+    """sha256 do conteúdo do ficheiro (e da versão da extração), lido em blocos."""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def extract_all(pdf_dir, output_dir, workers=None, pages_per_range=PAGES_PER_RANGE, force=False, manifest_path=MANIFEST_PATH,
+                summarize=False):
+    """Extrai o texto de todos os PDFs de pdf_dir num pool de processos.
+
+    PDFs cujo hash coincide com o do manifesto (e cujo .txt ainda existe) não são extraídos de novo.
+    Com summarize, cada .txt fica com o resumo das frases relevantes em vez do texto todo; o
+    manifesto distingue os dois modos, por isso mudar de modo extrai os PDFs de novo.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(manifest_path)
+
+    jobs = {}
+    skipped = 0
+    for filename in sorted(os.listdir(pdf_dir)):
+        if not filename.lower().endswith(".pdf"):
+            continue
+        pdf_path = os.path.join(pdf_dir, filename)
+        output_path = os.path.join(output_dir, os.path.splitext(filename)[0] + ".txt")
+        digest = file_hash(pdf_path) + (":summary" if summarize else "")
 
+        if manifest.get(filename) == digest and os.path.exists(output_path):
+            skipped += 1
+            continue
+        jobs[filename] = (pdf_path, output_path, digest)
 
-if __name__ == "__main__":
-    pdf_dir = "../PDF"
-    output_dir = "../PDF_Text"
+    print(f"{len(jobs)} PDFs para extrair, {skipped} sem alterações.")
 
-    os.makedirs(output_dir, exist_ok=True) 
+    start = time.perf_counter()
+    total_pages = 0
+    failed = 0
 
-    for filename in os.listdir(pdf_dir):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_pdf_to_file, pdf_path, output_path, pages_per_range): filename
+            for filename, (pdf_path, output_path, digest) in jobs.items()
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                pages, seconds = future.result()
+                if summarize:
+                    summarize_file(jobs[filename][1])
+            except Exception as e:
+                print(f"Erro a extrair {filename}: {e}")
+                failed += 1
+                continue
 
-        if filename.lower().endswith(".pdf"): 
-            pdf_path = os.path.join(pdf_dir, filename)
-            processed_text = process_pdf(pdf_path)
+            total_pages += pages
+            rate = pages / seconds if seconds > 0 else 0.0
+            print(f"{filename}: {pages} páginas em {seconds:.1f}s ({rate:.1f} páginas/s)")
 
-            output_filename = os.path.splitext(filename)[0] + ".txt"
-            output_path = os.path.join(output_dir, output_filename)
+            # O manifesto é guardado a cada PDF, para uma execução interrompida não repetir trabalho
+            manifest[filename] = jobs[filename][2]
+            save_manifest(manifest, manifest_path)
 
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(processed_text)
+    elapsed = time.perf_counter() - start
+    rate = total_pages / elapsed if elapsed > 0 else 0.0
+    print(f"{len(jobs) - failed} PDFs ({total_pages} páginas) extraídos em {elapsed:.1f}s ({rate:.1f} páginas/s), {failed} com erro.")
 
-            print(f"{filename} completed!")
 
-    print(f"Processing completed! Extracted texts are saved in '{output_dir}'")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai o texto dos PDFs para PDF_Text.")
+    parser.add_argument("--pdf-dir", default="../PDF")
+    parser.add_argument("--output-dir", default="../PDF_Text")
+    parser.add_argument("--workers", type=int, default=None, help="processos (por omissão, um por CPU)")
+    parser.add_argument("--pages-per-range", type=int, default=PAGES_PER_RANGE, help="páginas extraídas e limpas de cada vez")
+    parser.add_argument("--force", action="store_true", help="ignora o manifesto e extrai todos os PDFs")
+    parser.add_argument("--summarize", action="store_true", help="guarda o resumo das frases relevantes em vez do texto todo")
+    args = parser.parse_args()
+
+    extract_all(args.pdf_dir, args.output_dir, args.workers, args.pages_per_range, args.force, summarize=args.summarize)
+    print(f"Processing completed! Extracted texts are saved in '{args.output_dir}'")
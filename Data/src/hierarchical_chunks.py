@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_left
+import chunks_split
+from chunk_io import write_chunks
+from keyword_matcher import KeywordMatcher
+
+# Limites de tokens por chunk em cada nível (o nível 1 usa os limites de chunks_split)
+SECTION_MAX_TOKENS = 400   # nível 2: secções do texto completo dos PDFs
+WINDOW_MAX_TOKENS = 100    # nível 3: janelas mais finas dentro de cada secção
+
+
+def normalize_title(title):
+    """Título reduzido a letras e dígitos, para associar o mesmo artigo em fontes diferentes."""
+    return re.sub(r"[^a-z0-9]", "", (title or "").lower())
+
+
+def paper_key(paper):
+    """Identificador estável de um artigo (hash do título normalizado), usado nos ids dos chunks
+    do texto completo: não muda quando outros PDFs são acrescentados ou removidos."""
+    return hashlib.sha1(normalize_title(paper["title"]).encode("utf-8")).hexdigest()[:12]
+
+
+def safe_title(title):
+    """Nome de ficheiro usado por save_pdfs.py (e por extract_from_pdf.py, com .txt)."""
+    return "".join(c for c in title if c.isalnum() or c in " _-")
+
+
+def find_paper(filename, papers_by_safe_title):
+    """Metadados do artigo de um ficheiro de PDF_Text (os nomes longos podem estar truncados)."""
+    name = os.path.splitext(filename)[0]
+    if name in papers_by_safe_title:
+        return papers_by_safe_title[name]
+    prefix = name.rstrip()
+    for key, paper in papers_by_safe_title.items():
+        if key.startswith(prefix):
+            return paper
+    return None
+
+
+def sentence_units(doc, token_starts, max_length):
+    """Frases do documento como (texto, tokens); frases maiores que max_length são partidas por palavras."""
+
+    def count_tokens(start, end):
+        return bisect_left(token_starts, end) - bisect_left(token_starts, start)
+
+    for sent in doc.sents:
+        raw = sent.text
+        sent_text = raw.strip()
+        if not sent_text:
+            continue
+        start = sent.start_char + (len(raw) - len(raw.lstrip()))
+        sent_tokens = count_tokens(start, start + len(sent_text))
+
+        if sent_tokens <= max_length:
+            yield sent_text, sent_tokens
+            continue
+
+        words = []
+        length = 0
+        for word in re.finditer(r"\S+", sent_text):
+            word_tokens = count_tokens(start + word.start(), start + word.end())
+            if words and length + word_tokens > max_length:
+                yield " ".join(words), length
+                words = []
+                length = 0
+            words.append(word.group())
+            length += word_tokens
+        if words:
+            yield " ".join(words), length
+
+
+def group_units(units, max_length):
+    """Junta unidades consecutivas em grupos de até max_length tokens."""
+    groups = []
+    current = []
+    length = 0
+    for unit in units:
+        if current and length + unit[1] > max_length:
+            groups.append(current)
+            current = []
+            length = 0
+        current.append(unit)
+        length += unit[1]
+    if current:
+        groups.append(current)
+    return groups
+
+
+def split_full_text(doc, token_starts, section_max=SECTION_MAX_TOKENS, window_max=WINDOW_MAX_TOKENS):
+    """Divide um texto completo em secções (nível 2), cada uma com as suas janelas (nível 3).
+
+    As janelas são uma partição exata das frases da secção, por isso cada janela tem um
+    único pai e o texto de uma secção é a junção das suas janelas.
+    Devolve uma lista de (texto da secção, [textos das janelas]).
+    """
+    units = list(sentence_units(doc, token_starts, window_max))
+    sections = []
+    for section in group_units(units, section_max):
+        windows = [" ".join(text for text, _ in window) for window in group_units(section, window_max)]
+        sections.append((" ".join(text for text, _ in section), windows))
+    return sections
+
+
+def chunk_full_texts(text_dir, papers, batch_size=8, matcher=None):
+    """Gera os chunks de nível 2 e 3 dos textos em text_dir, com as ligações pai/filho entre eles.
+
+    Com um KeywordMatcher, cada chunk leva os tópicos das palavras-chave que contém (keyword_topics).
+    """
+    nlp, tokenizer = chunks_split.load_models()
+    papers_by_safe_title = {safe_title(paper["title"]): paper for paper in papers}
+
+    entries = []
+    seen_keys = set()
+    for filename in sorted(os.listdir(text_dir)):
+        if not filename.lower().endswith(".txt"):
+            continue
+        paper = find_paper(filename, papers_by_safe_title)
+        if paper is None:
+            print(f"Ignorar '{filename}': artigo não encontrado")
+            continue
+        if paper_key(paper) in seen_keys:
+            print(f"Ignorar '{filename}': texto repetido de um artigo já lido")
+            continue
+        seen_keys.add(paper_key(paper))
+        with open(os.path.join(text_dir, filename), "r", encoding="utf-8") as f:
+            text = f.read()
+        if text.strip():
+            entries.append((paper, text))
+
+    texts = [text for _, text in entries]
+    docs = nlp.pipe(texts, batch_size=batch_size)
+
+    for (paper, text), doc in zip(entries, docs):
+        key = paper_key(paper)
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        token_starts = [start for start, end in offsets]
+
+        metadata = {
+            "title": paper["title"],
+            "link": paper.get("pdf_link") or paper.get("link"),
+            "year": str(paper["year"]) if paper.get("year") is not None else None,
+            "topic": paper.get("topic"),
+        }
+
+        for idx, (section_text, windows) in enumerate(split_full_text(doc, token_starts)):
+            section_id = f"FullText{key}Chunk{idx}"
+            window_ids = [f"{section_id}Window{w}" for w in range(len(windows))]
+
+            section = {
+                "chunk_id": section_id,
+                "chunk_text": section_text,
+                **metadata,
+                "hierarchical_level": 2,
+                "parent_id": None,
+                "children_ids": window_ids,
+            }
+            window_chunks = [{
+                "chunk_id": window_id,
+                "chunk_text": window_text,
+                **metadata,
+                "hierarchical_level": 3,
+                "parent_id": section_id,
+                "children_ids": [],
+            } for window_id, window_text in zip(window_ids, windows)]
+
+            # As janelas partem a secção, por isso os tópicos da secção são a união dos das janelas
+            # (sem voltar a percorrer o texto; só se perde uma palavra-chave partida entre duas janelas)
+            if matcher is not None:
+                for window in window_chunks:
+                    window["keyword_topics"] = sorted(matcher.topics(window["chunk_text"]))
+                section["keyword_topics"] = sorted({topic for window in window_chunks for topic in window["keyword_topics"]})
+
+            yield section
+            yield from window_chunks
+
+
+def iter_hierarchical_chunks(abstracts, papers, text_dir, first_paper_id=1, workers=1, batch_size=64, matcher=None):
+    """Gera os chunks dos três níveis.
+
+    Nível 1: abstracts (como chunks_split.py). Nível 2: secções do texto completo dos PDFs.
+    Nível 3: janelas de cada secção.
+    Quando o mesmo artigo tem abstract e texto completo, os chunks do abstract apontam para as
+    secções (children_ids) e cada secção aponta para o primeiro chunk do abstract (parent_id).
+    """
+    # Os níveis 2 e 3 são calculados primeiro, para os chunks do nível 1 já saírem com os filhos
+    full_text_chunks = list(chunk_full_texts(text_dir, papers, matcher=matcher))
+
+    sections_by_title = {}
+    for chunk in full_text_chunks:
+        if chunk["hierarchical_level"] == 2:
+            sections_by_title.setdefault(normalize_title(chunk["title"]), []).append(chunk["chunk_id"])
+
+    parent_by_title = {}
+    for chunk in chunks_split.iter_process_json(abstracts, first_paper_id, workers, batch_size, matcher=matcher):
+        title = normalize_title(chunk["title"])
+        parent_by_title.setdefault(title, chunk["chunk_id"])
+        yield {**chunk, "parent_id": None, "children_ids": sections_by_title.get(title, [])}
+
+    for chunk in full_text_chunks:
+        if chunk["hierarchical_level"] == 2:
+            chunk["parent_id"] = parent_by_title.get(normalize_title(chunk["title"]))
+        yield chunk
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera os chunks dos níveis 1 (abstracts), 2 (texto completo) e 3 (janelas).")
+    parser.add_argument("--abstracts", nargs="+", default=["../JSON/pubmed_abstracts.json", "../JSON/FirstLevel.json"],
+                        help="ficheiros JSON com abstracts, pela ordem em que os papers são numerados")
+    parser.add_argument("--papers", default="../JSON/google_scholar_papers.json", help="metadados dos PDFs")
+    parser.add_argument("--text-dir", default="../PDF_Text")
+    parser.add_argument("--output", default="../ChunkedData/ChunkedData.jsonl")
+    parser.add_argument("--first-paper-id", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--tag-topics", action="store_true", help="acrescenta a cada chunk os tópicos das suas palavras-chave")
+    parser.add_argument("--keywords-file", help="tira as palavras-chave das pesquisas deste ficheiro (p.e. ../JSON/keywords.json)")
+    args = parser.parse_args()
+
+    abstracts = []
+    for path in args.abstracts:
+        with open(path, "r", encoding="utf-8") as f:
+            abstracts.extend(json.load(f))
+
+    with open(args.papers, "r", encoding="utf-8") as f:
+        papers = json.load(f)
+
+    matcher = None
+    if args.tag_topics:
+        matcher = KeywordMatcher.from_keywords_file(args.keywords_file) if args.keywords_file else KeywordMatcher()
+
+    chunks = iter_hierarchical_chunks(abstracts, papers, args.text_dir, args.first_paper_id, args.workers, args.batch_size, matcher)
+    count = write_chunks(args.output, chunks)
+    print(f"{count} chunks guardados em '{args.output}'")
@@ -0,0 +1,199 @@
+import json
+from collections import deque
+from functools import lru_cache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Palavras-chave de cada tópico (os tópicos são os de keywords.json)
+KEYWORDS_BY_TOPIC = {
+    # Álcool & Drogas
+    "alcohol_drugs": [
+        "alcohol", "binge drinking", "alcoholism", "liver disease", "addiction",
+        "drugs", "substance abuse", "opioids", "cocaine", "cannabis", "overdose", "rehabilitation",
+    ],
+
+    # Saúde & Higiene Pública
+    "hygiene": [
+        "health", "mental health", "physical health", "immune system", "nutrition",
+        "fitness", "exercise", "hygiene", "public hygiene", "infection control", "disease prevention",
+    ],
+
+    # Trabalho & Ergonomia
+    "work": [
+        "work", "occupational health", "workplace safety", "job stress", "burnout",
+        "productivity", "work-life balance",
+    ],
+    "ergonomics": [
+        "ergonomics", "posture", "back pain", "chronic pain",
+    ],
+
+    # Sono & Qualidade de Vida
+    "sleep": [
+        "sleep", "sleep quality", "circadian rhythm", "REM sleep", "sleep deprivation",
+        "insomnia", "melatonin", "sleep hygiene", "cognitive performance", "fatigue", "alertness",
+    ],
+
+    # Tabagismo & Saúde Pulmonar
+    "tobacco": [
+        "tobacco", "nicotine", "smoking", "cigarettes", "vaping", "smoking cessation",
+        "lungs", "respiratory health", "COPD", "lung cancer", "breathing exercises",
+    ],
+}
+
+# Palavras das pesquisas de keywords.json que não identificam o tema ("impact of ... on health")
+QUERY_STOPWORDS = {
+    "impact", "impacts", "of", "on", "in", "and", "the", "for", "by", "age", "health",
+    "benefits", "combined", "negative", "importance", "proper",
+}
+
+
+def keywords_from_queries(path="../JSON/keywords.json"):
+    """Palavras-chave de cada tópico a partir das pesquisas de keywords.json.
+
+    Cada pesquisa dá as sequências de palavras que sobram sem as palavras genéricas,
+    p.e. "impact of sleep duration on health by age" -> "sleep duration".
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    keywords_by_topic = {}
+    for topic, phrases in queries.items():
+        keywords = []
+        for phrase in phrases:
+            run = []
+            for word in phrase.lower().split() + [None]:
+                if word is not None and word not in QUERY_STOPWORDS:
+                    run.append(word)
+                elif run:
+                    keyword = " ".join(run)
+                    if keyword not in keywords:
+                        keywords.append(keyword)
+                    run = []
+        keywords_by_topic[topic] = keywords
+    return keywords_by_topic
+
+
+class KeywordMatcher:
+    """Autómato de Aho–Corasick com as palavras-chave de cada tópico.
+
+    O autómato é construído uma vez e percorre cada texto numa só passagem linear,
+    encontrando todas as ocorrências de todas as palavras-chave (sem distinguir maiúsculas,
+    como `kw.lower() in s.lower()`), independentemente do número de palavras-chave.
+    Usa o módulo pyahocorasick quando está instalado e uma implementação em Python caso contrário.
+    """
+
+    def __init__(self, keywords_by_topic=None):
+        keywords_by_topic = KEYWORDS_BY_TOPIC if keywords_by_topic is None else keywords_by_topic
+
+        # Palavra-chave (em minúsculas) -> tópicos a que pertence
+        self.topics_by_keyword = {}
+        for topic, keywords in keywords_by_topic.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword:
+                    self.topics_by_keyword.setdefault(keyword, set()).add(topic)
+
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for keyword in self.topics_by_keyword:
+                self.automaton.add_word(keyword, keyword)
+            if self.topics_by_keyword:
+                self.automaton.make_automaton()
+        else:
+            self.automaton = None
+            self.build()
+
+    @classmethod
+    def from_keywords(cls, keywords, topic=None):
+        """Autómato para uma lista simples de palavras-chave, todas do mesmo tópico."""
+        return cls({topic: list(keywords)})
+
+    @classmethod
+    def from_keywords_file(cls, path="../JSON/keywords.json"):
+        return cls(keywords_from_queries(path))
+
+    def build(self):
+        """Constrói as transições, as ligações de falha e as saídas de cada estado."""
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for keyword in self.topics_by_keyword:
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(keyword)
+
+        # Em largura: a ligação de falha de um estado é sempre de um nível anterior
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter_matches(self, text):
+        """Gera (início, fim, palavra-chave) de cada ocorrência no texto, incluindo sobreposições."""
+        text = text.lower()
+
+        if self.automaton is not None:
+            if self.topics_by_keyword:
+                for end, keyword in self.automaton.iter(text):
+                    yield end - len(keyword) + 1, end + 1, keyword
+            return
+
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                yield position - len(keyword) + 1, position + 1, keyword
+
+    def topics(self, text):
+        """Tópicos com pelo menos uma palavra-chave no texto."""
+        found = set()
+        for _, _, keyword in self.iter_matches(text):
+            found |= self.topics_by_keyword[keyword]
+        return found
+
+    def match_sentences(self, text, separator=". "):
+        """Frases (separadas como em filter_relevant_text) com alguma palavra-chave e os tópicos de cada uma.
+
+        Cada frase é percorrida uma só vez pelo autómato, por isso só contam as ocorrências
+        que estão por inteiro dentro da frase.
+        """
+        sentences = text.split(separator)
+        matched = []
+        for sentence in sentences:
+            topics = self.topics(sentence)
+            if topics:
+                matched.append((sentence, topics))
+        return matched
+
+    def filter_relevant_text(self, text):
+        """Mantém apenas frases que contenham palavras-chave (mesmo resultado de filter_relevant_text)."""
+        return "\n ".join(sentence for sentence, _ in self.match_sentences(text))
+
+
+@lru_cache(maxsize=8)
+def matcher_for_keywords(keywords):
+    """Autómato de uma tupla de palavras-chave, construído uma vez e reutilizado."""
+    return KeywordMatcher.from_keywords(keywords)
@@ -1,82 +1,228 @@
-import requests
-from xml.etree import ElementTree
-import time
+import asyncio
+import hashlib
 import json
+import os
+import random
+import time
+from xml.etree import ElementTree
+import aiohttp
+from dotenv import load_dotenv
+from chunk_io import iter_chunks, write_chunks
+from rate_limit import TokenBucket
+load_dotenv()
+
+BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+CACHE_DIR = "../Cache/pubmed"
+
+# O NCBI aceita 3 pedidos/s sem chave e 10 pedidos/s com NCBI_API_KEY
+RATE_WITHOUT_KEY = 3
+RATE_WITH_KEY = 10
+
+
+def parse_article(article, topic):
+    """Campos de um <PubmedArticle>; devolve None se o artigo não tiver abstract."""
+    pmid = article.find(".//PMID").text if article.find(".//PMID") is not None else ""
+    title_elem = article.find(".//ArticleTitle")
+    title = title_elem.text.strip() if title_elem is not None and title_elem.text else "No title available"
+    abstract_parts = article.findall(".//AbstractText")
+    abstract = " ".join([part.text.strip() for part in abstract_parts if part.text]) if abstract_parts else ""
+    if not abstract:
+        return None
+    date_elem = article.find(".//PubDate/Year")
+    date = date_elem.text if date_elem is not None else "No date available"
+    link = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else "No link available"
+
+    authors = []
+    for author in article.findall(".//Author"):
+        last_name = author.find("LastName")
+        first_name = author.find("ForeName")
+        full_name = " ".join(filter(None, [first_name.text if first_name is not None else "", last_name.text if last_name is not None else ""]))
+        if full_name.strip():
+            authors.append(full_name)
+
+    doi = "No DOI available"
+    for id_elem in article.findall(".//ArticleId"):
+        if id_elem.attrib.get("IdType") == "doi":
+            doi = id_elem.text
+            break
+
+    return {
+        "topic": topic,
+        "title": title,
+        "link": link,
+        "year": date,
+        "authors": authors,
+        "doi": doi,
+        "abstract": abstract
+    }
+
+
+def iter_articles(xml_path, topic):
+    """Lê uma resposta do efetch com iterparse, artigo a artigo, libertando cada um depois de lido."""
+    for _, elem in ElementTree.iterparse(xml_path, events=("end",)):
+        if elem.tag == "PubmedArticle":
+            article = parse_article(elem, topic)
+            elem.clear()
+            if article is not None:
+                yield article
+
+
+class PubMedHarvester:
+    """Recolhe abstracts do PubMed com as E-utilities, de forma assíncrona.
+
+    - o esearch usa o histórico do NCBI (usehistory=y) e o efetch pede os artigos em batches
+      de batch_size IDs a partir do WebEnv/query_key;
+    - todos os pedidos passam por um TokenBucket com o limite do NCBI, em vez de sleeps fixos;
+    - as respostas do efetch ficam em disco (CACHE_DIR), com o hash dos IDs pedidos como chave,
+      e são lidas com iterparse;
+    - concurrency pesquisas decorrem ao mesmo tempo.
+    """
+
+    def __init__(self, api_key=None, concurrency=4, batch_size=200, max_retries=5, cache_dir=CACHE_DIR):
+        self.api_key = api_key or os.getenv("NCBI_API_KEY")
+        self.bucket = TokenBucket(RATE_WITH_KEY if self.api_key else RATE_WITHOUT_KEY)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    async def request(self, session, endpoint, params, path=None):
+        """Faz um pedido às E-utilities (com novas tentativas). Com path, a resposta é escrita
+        diretamente nesse ficheiro; sem path, é devolvida em bytes."""
+        params = dict(params)
+        if self.api_key:
+            params["api_key"] = self.api_key
+
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire_async()
+            try:
+                async with session.get(BASE_URL + endpoint, params=params) as response:
+                    if response.status == 200:
+                        if path is None:
+                            return await response.read()
+
+                        tmp_path = path + ".part"
+                        with open(tmp_path, "wb") as f:
+                            async for block in response.content.iter_chunked(1 << 16):
+                                f.write(block)
+                        os.replace(tmp_path, path)
+                        return path
+
+                    error = f"HTTP {response.status}"
+                    if response.status not in (429, 500, 502, 503, 504):
+                        raise RuntimeError(f"{endpoint}: {error}")
+            except aiohttp.ClientError as e:
+                error = str(e)
+            except asyncio.TimeoutError:
+                # O ClientTimeout do pedido expirou: também se tenta de novo
+                error = "timeout"
+
+            if attempt == self.max_retries:
+                raise RuntimeError(f"{endpoint}: {error}, depois de {attempt + 1} tentativas")
+            wait_time = 2 ** attempt + random.uniform(0, 1)
+            print(f"Erro em {endpoint} ({error}). A tentar de novo em {wait_time:.1f}s...")
+            await asyncio.sleep(wait_time)
+
+    async def search(self, session, term, max_results):
+        """IDs da pesquisa e o WebEnv/query_key que os guarda no histórico do NCBI."""
+        content = await self.request(session, "esearch.fcgi", {
+            "db": "pubmed", "term": term, "retmax": max_results,
+            "retmode": "xml", "sort": "relevance", "usehistory": "y",
+        })
+        root = ElementTree.fromstring(content)
+        ids = [id_elem.text for id_elem in root.findall(".//IdList/Id")]
+        return ids, root.findtext("WebEnv"), root.findtext("QueryKey")
+
+    async def fetch_batch(self, session, webenv, query_key, retstart, ids):
+        """Ficheiro XML com os artigos de um batch, vindo da cache ou do efetch."""
+        key = hashlib.sha256(",".join(ids).encode("utf-8")).hexdigest()
+        path = os.path.join(self.cache_dir, f"{key}.xml")
+        if os.path.exists(path):
+            return path
+
+        return await self.request(session, "efetch.fcgi", {
+            "db": "pubmed", "query_key": query_key, "WebEnv": webenv,
+            "retstart": retstart, "retmax": len(ids), "retmode": "xml",
+        }, path=path)
+
+    async def harvest_keyword(self, session, topic, word, max_results):
+        print(f"Fetching abstracts for: {word} (Topic: {topic})...")
+
+        search_query = f"{word} AND 2019/01/01:3000/12/31[DP]"
+        ids, webenv, query_key = await self.search(session, search_query, max_results)
+        if not ids:
+            print(f"No articles found for: {word}")
+            return []
+
+        articles = []
+        for retstart in range(0, len(ids), self.batch_size):
+            path = await self.fetch_batch(session, webenv, query_key, retstart, ids[retstart:retstart + self.batch_size])
+            articles.extend(await asyncio.to_thread(lambda: list(iter_articles(path, topic))))
+
+        print(f"Completed fetching abstracts for: {word} ({len(articles)} abstracts)")
+        return articles
+
+    async def harvest(self, keywords, max_results, output_file):
+        """Recolhe os abstracts de todas as pesquisas e escreve-os em JSON Lines à medida que terminam.
+
+        Os resultados saem pela ordem de keywords.json (e não pela ordem em que terminam),
+        para os ids dos papers atribuídos depois por chunks_split.py não mudarem entre execuções.
+        """
+        jobs = [(topic, word) for topic, words in keywords.items() for word in words]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+
+        async def run(index, topic, word):
+            async with semaphore:
+                try:
+                    return index, await self.harvest_keyword(session, topic, word, max_results)
+                except Exception as e:
+                    print(f"Erro ao recolher '{word}': {e}")
+                    return index, []
+
+        total = 0
+        finished = {}
+        next_index = 0
+        timeout = aiohttp.ClientTimeout(total=300)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            with open(output_file, "w", encoding="utf-8") as f:
+                tasks = [asyncio.create_task(run(index, topic, word)) for index, (topic, word) in enumerate(jobs)]
+                for task in asyncio.as_completed(tasks):
+                    index, articles = await task
+                    finished[index] = articles
+
+                    # Escreve as pesquisas já terminadas que não estão à espera de uma anterior
+                    while next_index in finished:
+                        for article in finished.pop(next_index):
+                            f.write(json.dumps(article, ensure_ascii=False) + "\n")
+                            total += 1
+                        f.flush()
+                        next_index += 1
+
+        elapsed = time.perf_counter() - start
+        print(f"{total} abstracts de {len(jobs)} pesquisas em {elapsed:.1f}s")
+        return total
+
+
+def fetch_pubmed_abstracts(keywords, max_results=10, output_file="../JSON/pubmed_abstracts.json", batch_size=200, concurrency=4):
+    """Recolhe os abstracts e guarda-os em output_file.
+
+    Os resultados são escritos primeiro em JSON Lines (output_file + "l" quando output_file é .json)
+    e só no fim convertidos, em streaming, para o array JSON lido pelos outros scripts.
+    """
+    jsonl_file = output_file + "l" if output_file.endswith(".json") else output_file
+    harvester = PubMedHarvester(concurrency=concurrency, batch_size=batch_size)
+    asyncio.run(harvester.harvest(keywords, max_results, jsonl_file))
+
+    if jsonl_file != output_file:
+        write_chunks(output_file, iter_chunks(jsonl_file))
 
-def fetch_pubmed_abstracts(keywords, max_results=10, output_file="../JSON/pubmed_abstracts.json", batch_size=5):
-    base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-    all_abstracts = []
-    
-    for topic, words in keywords.items():
-        for word in words:
-            print(f"Fetching abstracts for: {word} (Topic: {topic})...")
-
-            search_query = f"{word} AND 2019/01/01:3000/12/31[DP]"
-            search_url = f"{base_url}esearch.fcgi?db=pubmed&term={search_query}&retmax={max_results}&retmode=xml&sort=relevance"
-            
-            search_response = requests.get(search_url)
-            search_root = ElementTree.fromstring(search_response.content)
-            id_list = [id_elem.text for id_elem in search_root.findall(".//Id")]
-
-            if not id_list:
-                print(f"No articles found for: {word}")
-                continue
-
-            for i in range(0, len(id_list), batch_size):
-                batch_ids = id_list[i:i + batch_size]
-                ids = ",".join(batch_ids)
-                
-                fetch_url = f"{base_url}efetch.fcgi?db=pubmed&id={ids}&retmode=xml"
-                fetch_response = requests.get(fetch_url)
-                fetch_root = ElementTree.fromstring(fetch_response.content)
-                
-                for article in fetch_root.findall(".//PubmedArticle"):
-                    pmid = article.find(".//PMID").text if article.find(".//PMID") is not None else ""
-                    title_elem = article.find(".//ArticleTitle")
-                    title = title_elem.text.strip() if title_elem is not None and title_elem.text else "No title available"
-                    abstract_parts = article.findall(".//AbstractText")
-                    abstract = " ".join([part.text.strip() for part in abstract_parts if part.text]) if abstract_parts else ""
-                    if not abstract:
-                        continue
-                    date_elem = article.find(".//PubDate/Year")
-                    date = date_elem.text if date_elem is not None else "No date available"
-                    link = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else "No link available"
-                    
-                    authors = []
-                    for author in article.findall(".//Author"):
-                        last_name = author.find("LastName")
-                        first_name = author.find("ForeName")
-                        full_name = " ".join(filter(None, [first_name.text if first_name is not None else "", last_name.text if last_name is not None else ""]))
-                        if full_name.strip():
-                            authors.append(full_name)
-                    
-                    doi = "No DOI available"
-                    for id_elem in article.findall(".//ArticleId"): 
-                        if id_elem.attrib.get("IdType") == "doi":
-                            doi = id_elem.text
-                            break
-                    
-                    all_abstracts.append({
-                        "topic": topic,
-                        "title": title,
-                        "link": link,
-                        "year": date,
-                        "authors": authors,
-                        "doi": doi,
-                        "abstract": abstract
-                    })
-                
-                time.sleep(1)
-            
-            print(f"Completed fetching abstracts for: {word}")
-    
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_abstracts, f, ensure_ascii=False, indent=4)
-    
     print(f"All abstracts saved to {output_file}")
 
 if __name__ == "__main__":
     with open("../JSON/keywords.json", "r", encoding="utf-8") as f:
         keywords = json.load(f)
 
-    fetch_pubmed_abstracts(keywords, max_results=50, batch_size=5)
+    fetch_pubmed_abstracts(keywords, max_results=50)
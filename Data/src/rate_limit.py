@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Limita o número de pedidos por segundo a uma API, partilhado entre threads ou tarefas asyncio.
+
+    rate: pedidos por segundo em regime contínuo. capacity: pedidos que podem sair seguidos
+    depois de um período sem pedidos. Cada pedido reserva um token; quando não há tokens,
+    espera apenas o tempo necessário para o próximo, em vez de um sleep fixo.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Reserva tokens e devolve quantos segundos é preciso esperar até poder usá-los."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, tokens=1):
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    async def acquire_async(self, tokens=1):
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    def set_rate(self, rate):
+        """Muda o ritmo (p.e. depois de um 429), mantendo os tokens já acumulados."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.rate = float(rate)
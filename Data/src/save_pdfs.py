@@ -1,10 +1,14 @@
+import argparse
 import json
 import os
 import time
 import random
+import threading
 import requests
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
@@ -66,27 +70,148 @@ def get_pdf_link(session, page_url):
         pdf_link = urljoin(page_url, pdf_link)
     return pdf_link
 
-def download_pdf(session, pdf_url, file_name):
-    """Faz o download do PDF a partir do link direto."""
+def download_pdf(session, pdf_url, file_name, chunk_size=1 << 16):
+    """Faz o download do PDF a partir do link direto, escrevendo-o em disco aos bocados.
+
+    O ficheiro é escrito em file_name + ".part" e só é renomeado no fim, por isso um download
+    interrompido nunca deixa um PDF incompleto; se falhar, o ".part" é apagado.
+    Devolve o número de bytes escritos (ou None).
+    """
+    tmp_name = file_name + ".part"
     try:
-        response = session.get(pdf_url, timeout=10)
-        response.raise_for_status()
+        with session.get(pdf_url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            size = 0
+            with open(tmp_name, "wb") as pdf_file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    pdf_file.write(chunk)
+                    size += len(chunk)
+        os.replace(tmp_name, file_name)
     except requests.RequestException as e:
         print(f"Erro a descarregar {pdf_url}: {e}")
-        return False
-
-    try:
-        with open(file_name, 'wb') as pdf_file:
-            pdf_file.write(response.content)
-        print(f"Ficheiro guardado: {file_name}")
-        return True
+        return None
     except Exception as e:
         print(f"Erro ao guardar {file_name}: {e}")
-        return False
+        return None
+    finally:
+        # Depois do os.replace já não existe; só fica se o download falhou a meio
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+    print(f"Ficheiro guardado: {file_name}")
+    return size
+
+
+class HostScheduler:
+    """Limita os pedidos a cada servidor: no máximo per_host ao mesmo tempo e, entre dois pedidos
+    ao mesmo servidor, uma pausa aleatória entre min_delay e max_delay segundos.
+    Pedidos a servidores diferentes não esperam uns pelos outros."""
+
+    def __init__(self, per_host=2, min_delay=2.0, max_delay=5.0):
+        self.per_host = per_host
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.next_request = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            semaphore = self.semaphores.setdefault(host, threading.Semaphore(self.per_host))
+
+        with semaphore:
+            # Reserva o próximo instante livre deste servidor e espera por ele fora do lock
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_request.get(host, now))
+                self.next_request[host] = start + random.uniform(self.min_delay, self.max_delay)
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class Manifest:
+    """Estado de cada artigo (pelo link da página): "done" ou "failed", guardado após cada artigo."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def get(self, page_url):
+        return self.entries.get(page_url)
+
+    def record(self, page_url, **entry):
+        with self.lock:
+            self.entries[page_url] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def article_file_name(article):
+    """Nome do ficheiro PDF de um artigo, feito a partir do título."""
+    safe_title = "".join(c for c in article.get("title", "untitled") if c.isalnum() or c in " _-")
+    return f"{safe_title}.pdf"
+
+
+def process_article(article, dir_path, scheduler, manifest, thread_local):
+    """Encontra e descarrega o PDF de um artigo. Devolve o número de bytes descarregados."""
+    title = article.get("title", "untitled")
+    page_url = article.get("pdf_link")
+
+    file_name = article_file_name(article)
+    file_path = os.path.join(dir_path, file_name)
+
+    # PDFs descarregados antes de existir o manifesto
+    if os.path.exists(file_path):
+        manifest.record(page_url, status="done", file=file_name, bytes=os.path.getsize(file_path))
+        return 0
+
+    if not hasattr(thread_local, "session"):
+        thread_local.session = create_session()
+    session = thread_local.session
+
+    print(f"Processando: {title}")
+    with scheduler.slot(page_url):
+        pdf_url = get_pdf_link(session, page_url)
+    if not pdf_url:
+        print(f"Não foi possível encontrar link PDF para: {title}")
+        manifest.record(page_url, status="failed", error="PDF link not found")
+        return 0
+
+    with scheduler.slot(pdf_url):
+        size = download_pdf(session, pdf_url, file_path)
+    if size is None:
+        manifest.record(page_url, status="failed", pdf_url=pdf_url, error="download failed")
+        return 0
+
+    manifest.record(page_url, status="done", pdf_url=pdf_url, file=file_name, bytes=size)
+    return size
+
 
 def main():
-    json_file = "../JSON/google_scholar_papers.json"
-    dir_path = "../PDF"
+    parser = argparse.ArgumentParser(description="Descarrega os PDFs dos artigos do Google Scholar.")
+    parser.add_argument("--input", default="../JSON/google_scholar_papers.json")
+    parser.add_argument("--output-dir", default="../PDF")
+    parser.add_argument("--manifest", default="../Cache/pdf_downloads.json")
+    parser.add_argument("--workers", type=int, default=8, help="downloads em paralelo (no total)")
+    parser.add_argument("--per-host", type=int, default=2, help="pedidos em paralelo ao mesmo servidor")
+    parser.add_argument("--min-delay", type=float, default=2.0, help="pausa mínima entre pedidos ao mesmo servidor")
+    parser.add_argument("--max-delay", type=float, default=5.0, help="pausa máxima entre pedidos ao mesmo servidor")
+    parser.add_argument("--retry-failed", action="store_true", help="tenta de novo os artigos que falharam antes")
+    args = parser.parse_args()
+
+    json_file = args.input
+    dir_path = args.output_dir
     os.makedirs(dir_path, exist_ok=True)
 
     if not os.path.exists(json_file):
@@ -100,30 +225,56 @@ def main():
         print(f"Erro a ler {json_file}: {e}")
         return
 
-    session = create_session()
-
-    articles = articles[50:]
-
+    # O manifesto substitui o antigo articles[50:]: os artigos já tratados são saltados.
+    # Artigos repetidos (mesmo link ou mesmo ficheiro de destino) só são descarregados uma vez,
+    # senão dois workers escreveriam no mesmo ".part" ao mesmo tempo
+    manifest = Manifest(args.manifest)
+    pending = []
+    seen_urls = set()
+    seen_files = set()
     for article in articles:
-        title = article.get("title", "untitled")
         page_url = article.get("pdf_link")
         if not page_url:
-            print(f"Sem link para o artigo: {title}")
+            print(f"Sem link para o artigo: {article.get('title', 'untitled')}")
             continue
-
-        print(f"Processando: {title}")
-        pdf_url = get_pdf_link(session, page_url)
-        if not pdf_url:
-            print(f"Não foi possível encontrar link PDF para: {title}")
+        entry = manifest.get(page_url)
+        if entry and (entry["status"] == "done" or not args.retry_failed):
+            continue
+        file_name = article_file_name(article)
+        if page_url in seen_urls or file_name in seen_files:
             continue
+        seen_urls.add(page_url)
+        seen_files.add(file_name)
+        pending.append(article)
+
+    print(f"{len(pending)} artigos por descarregar, {len(articles) - len(pending)} já tratados, repetidos ou sem link.")
+
+    scheduler = HostScheduler(args.per_host, args.min_delay, args.max_delay)
+    thread_local = threading.local()
+    start = time.perf_counter()
+    total_bytes = 0
+    downloaded = 0
 
-        safe_title = "".join(c for c in title if c.isalnum() or c in " _-")
-        file_name = f"{safe_title}.pdf"
-        file_path = os.path.join(dir_path, file_name)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(process_article, article, dir_path, scheduler, manifest, thread_local): article for article in pending}
+        for future in as_completed(futures):
+            # Um erro inesperado num artigo fica registado no manifesto e não interrompe os outros
+            try:
+                size = future.result()
+            except Exception as e:
+                article = futures[future]
+                print(f"Erro a processar {article.get('title', 'untitled')}: {e}")
+                manifest.record(article["pdf_link"], status="failed", error=str(e))
+                size = 0
+            if size:
+                downloaded += 1
+                total_bytes += size
+            print("------------------------------------------------")
 
-        download_pdf(session, pdf_url, file_path)
-        time.sleep(random.uniform(2, 5))
-        print("------------------------------------------------")
+    elapsed = time.perf_counter() - start
+    megabytes = total_bytes / 1e6
+    print(f"{downloaded} PDFs ({megabytes:.1f} MB) em {elapsed:.1f}s: "
+          f"{megabytes / elapsed if elapsed > 0 else 0:.2f} MB/s, {downloaded * 60 / elapsed if elapsed > 0 else 0:.1f} PDFs/min")
 
 if __name__ == "__main__":
     main()
@@ -1,58 +1,176 @@
 import requests
 import json
+import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from chunk_io import iter_chunks, write_chunks
+from rate_limit import TokenBucket
+load_dotenv()
 
-def fetch_semantic_scholar_abstracts(keywords, max_results=10, output_file="../JSON/semantic_scholar_abstracts.json", batch_size=5, api_key="TUA_API_KEY"):
-    headers = {"x-api-key": api_key}
-    base_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-    all_abstracts = []
+BASE_URL = "https://api.semanticscholar.org/graph/v1/paper"
+FIELDS = "title,abstract,year,authors,url,externalIds"
+CHECKPOINT_PATH = "../Cache/semantic_scholar_done.txt"
 
-    for topic, words in keywords.items():
-        for word in words:
-            print(f"Fetching papers for: {word} (Topic: {topic})...")
-            offset = 0
+SEARCH_PAGE_SIZE = 100      # máximo do /paper/search
+BULK_PAGE_SIZE = 1000       # máximo do /paper/search/bulk
+BATCH_SIZE = 500            # máximo do /paper/batch
+
+
+class SemanticScholarFetcher:
+    """Recolhe artigos do Semantic Scholar para várias pesquisas ao mesmo tempo.
+
+    Todas as threads partilham uma sessão e um TokenBucket com o limite da API (rate pedidos/s).
+    Pedidos com 429/5xx são repetidos com backoff exponencial e jitter.
+    Com bulk=True, os IDs vêm do /paper/search/bulk (até 1000 por página, sem ordenação por
+    relevância) e os detalhes do /paper/batch (até 500 artigos por pedido); caso contrário,
+    o /paper/search devolve os artigos por relevância, 100 por página.
+    """
+
+    def __init__(self, api_key=None, rate=1.0, workers=4, max_retries=5, bulk=False):
+        self.session = requests.Session()
+        api_key = api_key or os.getenv("SEMANTIC_SCHOLAR_API_KEY")
+        if api_key:
+            self.session.headers.update({"x-api-key": api_key})
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
 
+        self.bucket = TokenBucket(rate)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bulk = bulk
+
+    def request(self, method, url, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.request(method, url, timeout=60, **kwargs)
+                if response.status_code == 200:
+                    return response.json()
+                error = f"{response.status_code} - {response.text[:200]}"
+                if response.status_code != 429 and response.status_code < 500:
+                    raise RuntimeError(f"Erro na request: {error}")
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt == self.max_retries:
+                raise RuntimeError(f"Erro na request: {error}, depois de {attempt + 1} tentativas")
+            wait_time = 2 ** attempt + random.uniform(0, 1)
+            print(f"Erro na request ({error}). A tentar de novo em {wait_time:.1f}s...")
+            time.sleep(wait_time)
+
+    def search(self, word, max_results):
+        """Artigos de uma pesquisa, com todos os campos de FIELDS."""
+        if not self.bulk:
+            papers = []
+            offset = 0
             while offset < max_results:
-                params = {
+                data = self.request("GET", f"{BASE_URL}/search", params={
                     "query": word,
-                    "limit": min(batch_size, max_results - offset),
+                    "limit": min(SEARCH_PAGE_SIZE, max_results - offset),
                     "offset": offset,
-                    "fields": "title,abstract,year,authors,url,externalIds"
-                }
-
-                response = requests.get(base_url, headers=headers, params=params)
-                if response.status_code != 200:
-                    print(f"Erro na request: {response.status_code} - {response.text}")
-                    break
-
-                data = response.json().get("data", [])
+                    "fields": FIELDS,
+                }).get("data", [])
                 if not data:
                     break
+                papers.extend(data)
+                offset += len(data)
+            return papers[:max_results]
+
+        ids = []
+        token = None
+        while len(ids) < max_results:
+            params = {"query": word, "fields": "paperId"}
+            if token:
+                params["token"] = token
+            result = self.request("GET", f"{BASE_URL}/search/bulk", params=params)
+            ids.extend(paper["paperId"] for paper in result.get("data", []))
+            token = result.get("token")
+            if not token or not result.get("data"):
+                break
+        ids = ids[:max_results]
+
+        papers = []
+        for start in range(0, len(ids), BATCH_SIZE):
+            papers.extend(self.request("POST", f"{BASE_URL}/batch", params={"fields": FIELDS},
+                                       json={"ids": ids[start:start + BATCH_SIZE]}))
+        return [paper for paper in papers if paper]
+
+    @staticmethod
+    def to_record(paper, topic):
+        if not paper.get("abstract"):
+            return None
+        authors = [a.get("name") for a in paper.get("authors", []) if a.get("name")]
+        doi = (paper.get("externalIds") or {}).get("DOI", "No DOI available")
+        return {
+            "topic": topic,
+            "title": paper.get("title", "No title available"),
+            "link": paper.get("url", "No link available"),
+            "year": paper.get("year", "No year available"),
+            "authors": authors,
+            "doi": doi,
+            "abstract": paper["abstract"]
+        }
+
+    def fetch_all(self, keywords, max_results, stream_path, checkpoint_path=CHECKPOINT_PATH):
+        """Corre as pesquisas em paralelo e acrescenta os resultados de cada uma a stream_path
+        (JSON Lines) assim que termina. As pesquisas já terminadas (checkpoint) são saltadas."""
+        os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+        done = set()
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                done = {line.rstrip("\n") for line in f if line.strip()}
+
+        jobs = [(topic, word) for topic, words in keywords.items() for word in words
+                if f"{topic}\t{word}" not in done]
+        if done:
+            print(f"{len(done)} pesquisas já feitas, {len(jobs)} por fazer.")
+
+        write_lock = threading.Lock()
+        start = time.perf_counter()
+        total = 0
+
+        def run(topic, word):
+            print(f"Fetching papers for: {word} (Topic: {topic})...")
+            records = [r for r in (self.to_record(p, topic) for p in self.search(word, max_results)) if r]
+
+            # Os resultados e o checkpoint são escritos juntos, para uma pesquisa nunca ficar a meio
+            with write_lock:
+                with open(stream_path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps({"query": word, **record}, ensure_ascii=False) + "\n")
+                with open(checkpoint_path, "a", encoding="utf-8") as f:
+                    f.write(f"{topic}\t{word}\n")
 
-                for paper in data:
-                    if not paper.get("abstract"):
-                        continue
+            print(f"Completed fetching papers for: {word} ({len(records)} papers)")
+            return len(records)
 
-                    authors = [a.get("name") for a in paper.get("authors", []) if a.get("name")]
-                    doi = paper.get("externalIds", {}).get("DOI", "No DOI available")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(run, topic, word): word for topic, word in jobs}
+            for future in as_completed(futures):
+                try:
+                    total += future.result()
+                except Exception as e:
+                    print(f"Erro ao recolher '{futures[future]}': {e}")
 
-                    all_abstracts.append({
-                        "topic": topic,
-                        "title": paper.get("title", "No title available"),
-                        "link": paper.get("url", "No link available"),
-                        "year": paper.get("year", "No year available"),
-                        "authors": authors,
-                        "doi": doi,
-                        "abstract": paper["abstract"]
-                    })
+        elapsed = time.perf_counter() - start
+        print(f"{total} papers de {len(jobs)} pesquisas em {elapsed:.1f}s")
 
-                offset += batch_size
-                time.sleep(1)
 
-            print(f"Completed fetching papers for: {word}")
+def fetch_semantic_scholar_abstracts(keywords, max_results=10, output_file="../JSON/semantic_scholar_abstracts.json",
+                                     api_key=None, workers=4, bulk=False, checkpoint_path=CHECKPOINT_PATH):
+    stream_path = output_file + "l" if output_file.endswith(".json") else output_file
+    fetcher = SemanticScholarFetcher(api_key=api_key, workers=workers, bulk=bulk)
+    fetcher.fetch_all(keywords, max_results, stream_path, checkpoint_path)
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_abstracts, f, ensure_ascii=False, indent=4)
+    if stream_path != output_file:
+        # O array final é escrito à medida que o JSON Lines é lido, sem o carregar para memória:
+        # os artigos de cada pesquisa ficam juntos, pela ordem em que as pesquisas terminaram
+        records = iter_chunks(stream_path)
+        write_chunks(output_file, ({k: v for k, v in r.items() if k != "query"} for r in records))
 
     print(f"All abstracts saved to {output_file}")
 
@@ -60,4 +178,4 @@ if __name__ == "__main__":
     with open("../JSON/keywords.json", "r", encoding="utf-8") as f:
         keywords = json.load(f)
 
-    fetch_semantic_scholar_abstracts(keywords, max_results=50, batch_size=5, api_key="TUA_API_KEY")
+    fetch_semantic_scholar_abstracts(keywords, max_results=50)
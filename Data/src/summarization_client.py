@@ -0,0 +1,163 @@
+import email.utils
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+load_dotenv()
+
+# O endereço pode ser trocado (p.e. por um servidor local para testes) com SUMMARIZATION_API_URL
+DEFAULT_API_URL = "https://api-inference.huggingface.co/models/facebook/bart-large-cnn"
+DEFAULT_PARAMETERS = {"max_length": 200, "min_length": 50, "do_sample": False}
+CACHE_PATH = "../Cache/summaries.jsonl"
+
+
+def retry_after_seconds(response, default):
+    """Segundos indicados no cabeçalho Retry-After (em segundos ou como data HTTP), ou default."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class SummarizationClient:
+    """Cliente do serviço de resumos (bart-large-cnn na API de inferência da Hugging Face).
+
+    - envia batch_size textos por pedido;
+    - faz no máximo max_workers pedidos ao mesmo tempo, numa sessão com um pool de ligações;
+    - em 429/503 espera o tempo de Retry-After (ou um backoff exponencial) e tenta de novo;
+    - guarda cada resumo em disco, com o sha256 do texto e dos parâmetros como chave, para
+      não voltar a pedir resumos de textos já resumidos.
+    """
+
+    def __init__(self, api_url=None, api_key=None, parameters=None, batch_size=8, max_workers=4,
+                 max_retries=5, timeout=120, cache_path=CACHE_PATH):
+        self.api_url = api_url or os.getenv("SUMMARIZATION_API_URL") or DEFAULT_API_URL
+        self.parameters = DEFAULT_PARAMETERS if parameters is None else parameters
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        api_key = api_key or os.getenv("HF_API_KEY")
+        if api_key:
+            self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.cache_path = cache_path
+        self.cache_lock = threading.Lock()
+        self.cache = self.load_cache()
+
+    def cache_key(self, text):
+        key = json.dumps({"url": self.api_url, "parameters": self.parameters, "text": text}, sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def load_cache(self):
+        cache = {}
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return cache
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # linha incompleta de uma execução interrompida
+                cache[entry["key"]] = entry["summary"]
+        return cache
+
+    def save_to_cache(self, entries):
+        """Acrescenta (chave, resumo) à cache em memória e ao ficheiro (só se escreve no fim do ficheiro)."""
+        with self.cache_lock:
+            for key, summary in entries:
+                self.cache[key] = summary
+            if self.cache_path:
+                os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+                with open(self.cache_path, "a", encoding="utf-8") as f:
+                    for key, summary in entries:
+                        f.write(json.dumps({"key": key, "summary": summary}, ensure_ascii=False) + "\n")
+
+    def request_batch(self, texts):
+        """Pede os resumos de um batch; devolve a lista de resumos ou None se o pedido falhar."""
+        payload = {"inputs": texts, "parameters": self.parameters}
+
+        for attempt in range(self.max_retries + 1):
+            backoff = 2 ** attempt + random.uniform(0, 1)
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                wait_time = backoff
+                print(f"Erro no pedido de resumo: {e}. A aguardar {wait_time:.1f}s...")
+            else:
+                if response.status_code in (429, 503):
+                    wait_time = retry_after_seconds(response, backoff)
+                    print(f"HTTP {response.status_code} no pedido de resumo. A aguardar {wait_time:.1f}s...")
+                elif response.status_code != 200:
+                    print(f"Erro HTTP {response.status_code}: {response.text}")
+                    return None
+                else:
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        print("Erro: Resposta vazia ou inválida da API.")
+                        return None
+                    if not isinstance(result, list) or len(result) != len(texts):
+                        print(f"Erro: Resposta inválida da API ({result})")
+                        return None
+                    return [item.get("summary_text") if isinstance(item, dict) else None for item in result]
+
+            if attempt < self.max_retries:
+                time.sleep(wait_time)
+
+        print("Erro: Número máximo de tentativas atingido.")
+        return None
+
+    def summarize_batch(self, keyed_texts):
+        summaries = self.request_batch([text for _, text in keyed_texts])
+        if summaries is None:
+            return {}
+        entries = [(key, summary) for (key, _), summary in zip(keyed_texts, summaries) if summary is not None]
+        self.save_to_cache(entries)
+        return dict(entries)
+
+    def summarize_many(self, texts):
+        """Resumos de vários textos, pela mesma ordem (None para os que falharam)."""
+        start = time.perf_counter()
+        keys = [self.cache_key(text) for text in texts]
+
+        # Só os textos diferentes e ainda sem resumo em cache vão ao serviço
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in self.cache and key not in pending:
+                pending[key] = text
+
+        items = list(pending.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for _ in executor.map(self.summarize_batch, batches):
+                    pass
+
+            elapsed = time.perf_counter() - start
+            print(f"{len(items)} textos resumidos em {len(batches)} pedidos ({elapsed:.1f}s), "
+                  f"{len(texts) - len(items)} já estavam resumidos (cache ou repetidos).")
+
+        return [self.cache.get(key) for key in keys]
+
+    def summarize(self, text):
+        return self.summarize_many([text])[0]
@@ -0,0 +1,151 @@
+import argparse
+import os
+import re
+import time
+
+# Regras por omissão, equivalentes às funções de limpeza de extract_from_pdf.py (pela mesma ordem).
+# Filtros de linha: predicados que devolvem algo verdadeiro quando a linha deve ser removida.
+
+# remove_page_numbers_and_headers: aplicados às linhas tal como saem do PDF
+RAW_LINE_FILTERS = [
+    re.compile(r"\s*\d+\s*").fullmatch,                          # Números de página isolados
+    re.compile(r"page\s+\d+\s+of\s+\d+", re.IGNORECASE).search,  # "Page X of Y"
+    re.compile(r"\s*[A-ZÀ-Ÿ ]{4,}\s*").fullmatch,                 # Cabeçalhos em maiúsculas
+]
+
+# remove_bibliographic_references: [1] e (Smith, 2020). A segunda pode atravessar uma quebra de linha
+REFERENCE_PATTERNS = [
+    re.compile(r"\[\d+\]"),
+    re.compile(r"\([A-Za-zÀ-ÿ]+,\s*\d{4}\)"),
+]
+
+# Fim de linha que pode continuar uma referência (Smith, 2020) na linha seguinte
+OPEN_REFERENCE = re.compile(r"\([A-Za-zÀ-ÿ]+,\s*\Z")
+
+# remove_titles_and_subtitles: aplicados às linhas já sem espaços nas pontas
+LINE_FILTERS = [
+    re.compile(r"[A-ZÀ-Ÿ\s\-]{4,}").fullmatch,                                  # Títulos em maiúsculas
+    re.compile(r"\d+(\.\d+)*\s+[A-Za-zÀ-ÿ]+.*").fullmatch,                      # "1. Introdução", "2.1 Definição"
+    re.compile(r"(Cap(í|i)tulo|Seç(ã|a)o)\s+\d+[:\-]\s+.*", re.IGNORECASE).fullmatch,  # "Capítulo X - Nome"
+]
+
+# Substituições dentro de cada linha (URLs, emails, parênteses soltos e símbolos inúteis)
+SUBSTITUTIONS = [
+    (re.compile(r"http[s]?://\S+"), ""),
+    (re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b"), ""),
+    (re.compile(r"[\[\]\(\)\{\}<>]"), ""),
+    (re.compile(r"[_~#*]"), ""),
+]
+
+
+class TextCleaner:
+    """Limpeza de texto numa só passagem pelas linhas, com as expressões regulares já compiladas.
+
+    Cada linha passa pelos filtros de linha originais, pela remoção de referências, pelos filtros
+    de títulos e pelas substituições, e o resultado final tem os espaços normalizados, tal como
+    clean_text fazia com várias passagens pelo documento inteiro.
+    As linhas só são juntadas quando uma referência (Autor, ano) continua na linha seguinte.
+
+    Regras próprias podem ser passadas no construtor ou acrescentadas com add_line_filter e
+    add_substitution; as substituições são aplicadas linha a linha.
+    """
+
+    def __init__(self, raw_line_filters=None, reference_patterns=None, line_filters=None, substitutions=None):
+        self.raw_line_filters = list(RAW_LINE_FILTERS if raw_line_filters is None else raw_line_filters)
+        self.reference_patterns = list(REFERENCE_PATTERNS if reference_patterns is None else reference_patterns)
+        self.line_filters = list(LINE_FILTERS if line_filters is None else line_filters)
+        self.substitutions = list(SUBSTITUTIONS if substitutions is None else substitutions)
+
+    def add_line_filter(self, pattern, flags=0, match="fullmatch"):
+        """Remove as linhas (sem espaços nas pontas) que correspondem ao padrão (fullmatch ou search)."""
+        self.line_filters.append(getattr(re.compile(pattern, flags), match))
+        return self
+
+    def add_substitution(self, pattern, replacement="", flags=0):
+        """Substitui o padrão em cada linha, depois das substituições já existentes."""
+        self.substitutions.append((re.compile(pattern, flags), replacement))
+        return self
+
+    def remove_references(self, text):
+        for pattern in self.reference_patterns:
+            text = pattern.sub("", text)
+        return text
+
+    def clean_line(self, line):
+        """Filtros de títulos e substituições de uma linha; devolve None se a linha for removida."""
+        line = line.strip()
+        for line_filter in self.line_filters:
+            if line_filter(line):
+                return None
+        for pattern, replacement in self.substitutions:
+            line = pattern.sub(replacement, line)
+        return line
+
+    def iter_blocks(self, lines):
+        """Linhas que passam os filtros iniciais, já sem referências.
+
+        Normalmente cada bloco é uma linha; só quando uma referência pode continuar na linha
+        seguinte é que as linhas são juntadas antes de remover as referências.
+        """
+        pending = []
+        for line in lines:
+            for line_filter in self.raw_line_filters:
+                if line_filter(line):
+                    break
+            else:
+                pending.append(line)
+                block = self.remove_references("\n".join(pending) if len(pending) > 1 else line)
+                if OPEN_REFERENCE.search(block):
+                    continue
+                pending = []
+                yield block
+
+        if pending:
+            yield self.remove_references("\n".join(pending))
+
+    def iter_lines(self, lines):
+        """Gera as linhas limpas (ainda com espaços por normalizar) a partir de um iterável de linhas."""
+        for block in self.iter_blocks(lines):
+            for line in block.splitlines():
+                line = self.clean_line(line)
+                if line is not None:
+                    yield line
+
+    def clean(self, text):
+        """Texto limpo, com espaços e quebras de linha reduzidos a um espaço."""
+        return " ".join(" ".join(self.iter_lines(text.splitlines())).split())
+
+
+def benchmark(text_dir, repeat=3):
+    """Compara MB/s da limpeza original (várias passagens) com o TextCleaner nos textos de text_dir."""
+    from extract_from_pdf import clean_text_multipass
+
+    texts = []
+    for filename in sorted(os.listdir(text_dir)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(text_dir, filename), "r", encoding="utf-8") as f:
+                texts.append(f.read())
+
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    cleaner = TextCleaner()
+
+    for name, clean in [("Original", clean_text_multipass), ("TextCleaner", cleaner.clean)]:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                clean(text)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name}: {megabytes / best:.1f} MB/s ({megabytes:.1f} MB em {best:.2f}s)")
+
+    different = sum(1 for text in texts if clean_text_multipass(text) != cleaner.clean(text))
+    print(f"Textos com resultado diferente: {different} de {len(texts)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark da limpeza de texto.")
+    parser.add_argument("--text-dir", default="../PDF_Text")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    benchmark(args.text_dir, args.repeat)
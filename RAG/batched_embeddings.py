@@ -0,0 +1,123 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MODEL = "nomic-embed-text"
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+def text_hash(model, text):
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    # Embeddings saved in a SQLite file, keyed by the hash of (model, chunk text)
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB)")
+        self.lock = threading.Lock()
+
+    def get_many(self, hashes):
+        found = {}
+        with self.lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype="float32").tolist()
+        return found
+
+    def put_many(self, items):
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype="float32").tobytes()) for key, vector in items]
+            )
+            self.connection.commit()
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    # LangChain embeddings for a local Ollama server, made for indexing many chunks:
+    #   - chunks are sent batch_size at a time to /api/embed (one request per batch, not per chunk)
+    #   - up to max_workers batches are in flight at once, over a pooled HTTP session
+    #   - with cache_path, embeddings are saved in SQLite by chunk hash and never computed twice
+    #   - defaults to nomic-embed-text, a small dedicated embedding model (ollama pull nomic-embed-text)
+    # Servers without /api/embed (Ollama < 0.3) are asked one chunk at a time through /api/embeddings.
+    def __init__(self, model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, batch_size=32, max_workers=4,
+                 cache_path="embedding_cache.sqlite", timeout=120, max_retries=3, verbose=True):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self.legacy_api = False
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, endpoint, payload):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(f"{self.base_url}{endpoint}", json=payload, timeout=self.timeout)
+                if response.status_code == 404 and endpoint == "/api/embed" and "model" not in response.text.lower():
+                    return None  # endpoint not available on this server
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Ollama {endpoint} failed after {attempt + 1} attempts: {e}")
+                time.sleep(2 ** attempt)
+
+    def embed_batch(self, texts):
+        if not self.legacy_api:
+            result = self.post("/api/embed", {"model": self.model, "input": texts})
+            if result is not None:
+                return result["embeddings"]
+            self.legacy_api = True
+
+        return [self.post("/api/embeddings", {"model": self.model, "prompt": text})["embedding"] for text in texts]
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        hashes = [text_hash(self.model, text) for text in texts]
+        vectors = self.cache.get_many(list(set(hashes))) if self.cache else {}
+        cached = len(vectors)
+
+        # Each distinct text that is not cached yet is embedded once
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        missing = list(missing.items())
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.embed_batch, [text for _, text in batch]): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                items = list(zip([key for key, _ in batch], future.result()))
+                vectors.update(items)
+                if self.cache:
+                    self.cache.put_many(items)
+
+        elapsed = time.perf_counter() - start
+        if self.verbose and texts:
+            print(f"Embedded {len(texts)} chunks with {self.model} ({cached} from cache) in {elapsed:.1f}s "
+                  f"({len(texts) / elapsed if elapsed else 0:.1f} chunks/s)")
+        return [vectors[key] for key in hashes]
+
+    def embed_query(self, text):
+        return self.embed_batch([text])[0]
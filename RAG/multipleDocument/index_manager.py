@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import time
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders import TextLoader
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+INDEX_FILE = "index.faiss"
+METADATA_FILE = "metadata.json"
+FORMAT_VERSION = 1
+
+
+def file_hash(path):
+    # sha256 of the file contents, read in blocks
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_atomic(path, write):
+    # Write to a temporary file and rename it, so a crash never leaves a half-written file
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class LocalIndexManager:
+    # FAISS index of the papers, kept on disk without pickle:
+    #   index.faiss   - the vectors, in an IndexIDMap2 so every chunk keeps a stable id;
+    #                   memory-mapped read-only on startup (IO_FLAG_MMAP_IFC) instead of read into
+    #                   memory, and only read into memory when sync() has to change it
+    #   metadata.json - the hash and chunk ids of every source file and the text/metadata of every chunk
+    # sync() compares the hash of each source file with the stored one and only removes/embeds
+    # the chunks of new, changed or deleted files.
+    def __init__(self, index_dir, embedding_function, chunk_size=300, chunk_overlap=30):
+        self.index_dir = index_dir
+        self.embedding_function = embedding_function
+        self.embedding_model = getattr(embedding_function, "model", type(embedding_function).__name__)
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.chunk_settings = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+        self.index = None
+        self.index_mapped = False  # True while self.index is a read-only view of index.faiss
+        self.files = {}      # source path -> {"hash", "ids"}
+        self.chunks = {}     # chunk id (str) -> {"page_content", "metadata"}
+        self.next_id = 0
+        self.load()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.index_dir, INDEX_FILE)
+
+    @property
+    def metadata_path(self):
+        return os.path.join(self.index_dir, METADATA_FILE)
+
+    def load(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.metadata_path)):
+            return
+
+        with open(self.metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        # An index built with another embedding model or splitter cannot be reused
+        if metadata.get("version") != FORMAT_VERSION or metadata.get("embedding_model") != self.embedding_model \
+                or metadata.get("chunk_settings") != self.chunk_settings:
+            print("Index built with other settings, rebuilding it...")
+            return
+
+        index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP_IFC)
+        # The index and metadata are saved one after the other; if they do not match, rebuild
+        if index.ntotal != len(metadata["chunks"]):
+            print("Index and metadata do not match, rebuilding the index...")
+            return
+
+        self.index = index
+        self.index_mapped = True
+        self.files = metadata["files"]
+        self.chunks = metadata["chunks"]
+        self.next_id = metadata["next_id"]
+
+    def make_writable(self):
+        # A memory-mapped index cannot be changed (faiss aborts), so read a copy into memory first
+        if self.index_mapped:
+            self.index = faiss.read_index(self.index_path)
+            self.index_mapped = False
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.index is not None:
+            write_atomic(self.index_path, lambda path: faiss.write_index(self.index, path))
+
+        metadata = {
+            "version": FORMAT_VERSION,
+            "embedding_model": self.embedding_model,
+            "chunk_settings": self.chunk_settings,
+            "next_id": self.next_id,
+            "files": self.files,
+            "chunks": self.chunks,
+        }
+
+        def write_metadata(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False)
+
+        write_atomic(self.metadata_path, write_metadata)
+
+    def remove_file(self, path):
+        ids = self.files.pop(path)["ids"]
+        if ids and self.index is not None:
+            self.index.remove_ids(np.array(ids, dtype="int64"))
+        for chunk_id in ids:
+            self.chunks.pop(str(chunk_id), None)
+        return len(ids)
+
+    def add_files(self, paths, hashes):
+        # Split every file and embed all their chunks with a single embed_documents call,
+        # so a batching embedder can fill its batches across files
+        texts_by_file = [(path, self.text_splitter.split_documents(TextLoader(path, encoding="utf-8").load())) for path in paths]
+        texts = [text for _, file_texts in texts_by_file for text in file_texts]
+        if texts:
+            vectors = np.array(self.embedding_function.embed_documents([t.page_content for t in texts]), dtype="float32")
+            if self.index is None:
+                # Same metric as FAISS.from_documents (flat L2), with explicit ids
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            self.index.add_with_ids(vectors, np.arange(self.next_id, self.next_id + len(texts), dtype="int64"))
+
+        for path, file_texts in texts_by_file:
+            ids = list(range(self.next_id, self.next_id + len(file_texts)))
+            self.next_id += len(file_texts)
+            for chunk_id, text in zip(ids, file_texts):
+                self.chunks[str(chunk_id)] = {"page_content": text.page_content, "metadata": text.metadata}
+            self.files[path] = {"hash": hashes[path], "ids": ids}
+        return len(texts)
+
+    def sync(self, paths):
+        # Bring the index up to date with the source files: the chunks of deleted or changed files
+        # are removed and new or changed files are split and embedded. Saves only if something changed.
+        paths = list(paths)
+        hashes = {path: file_hash(path) for path in paths}
+
+        removed = [path for path in self.files if path not in hashes or self.files[path]["hash"] != hashes[path]]
+        added = [path for path in paths if path not in self.files or self.files[path]["hash"] != hashes[path]]
+        if not removed and not added:
+            return False
+
+        self.make_writable()
+        removed_chunks = sum(self.remove_file(path) for path in removed)
+        added_chunks = self.add_files(added, hashes)
+        self.save()
+
+        print(f"Index updated: {len(added)} files embedded ({added_chunks} chunks), {removed_chunks} chunks removed.")
+        return True
+
+    def as_vectorstore(self):
+        # LangChain FAISS store over the managed index. The IndexIDMap2 returns the chunk ids,
+        # which are also the docstore keys.
+        docstore = InMemoryDocstore({
+            chunk_id: Document(page_content=chunk["page_content"], metadata=chunk["metadata"])
+            for chunk_id, chunk in self.chunks.items()
+        })
+        index_to_docstore_id = {int(chunk_id): chunk_id for chunk_id in self.chunks}
+        return FAISS(embedding_function=self.embedding_function, index=self.index, docstore=docstore,
+                     index_to_docstore_id=index_to_docstore_id)
+
+
+def load_index(index_dir, embedding_function, paths, **kwargs):
+    # Load (memory-mapped, read-only) and update the index of paths, and report how long it took
+    start = time.perf_counter()
+    manager = LocalIndexManager(index_dir, embedding_function, **kwargs)
+    manager.sync(paths)
+    vectorstore = manager.as_vectorstore()
+    print(f"Index ready in {time.perf_counter() - start:.2f}s ({len(manager.chunks)} chunks).")
+    return manager, vectorstore
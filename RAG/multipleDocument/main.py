@@ -1,10 +1,15 @@
-from langchain_ollama import OllamaEmbeddings
+import os
+import sys
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import TextLoader
 from langchain_ollama import OllamaLLM
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
 
+# batched_embeddings.py fica em RAG/, partilhado pelos scripts de RAG
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from batched_embeddings import BatchedOllamaEmbeddings
+
 # Carregar múltiplos documentos (papers)
 documents = []
 papers = ["paper1.txt", "paper2.txt", "paper3.txt", "paper4.txt", "paper5.txt"]  # Add your papers here
@@ -17,8 +22,8 @@ for paper in papers:
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30)
 texts = text_splitter.split_documents(documents)
 
-# Criar embeddings usando Ollama
-embedding_function = OllamaEmbeddings(model="mistral")
+# Criar embeddings usando Ollama, em batches de chunks enviados em paralelo e com cache por hash do chunk
+embedding_function = BatchedOllamaEmbeddings(model="nomic-embed-text")  # Substitua pelo modelo desejado
 
 # Criar banco de dados vetorial usando FAISS
 vectorstore = FAISS.from_documents(texts, embedding_function)
@@ -1,50 +1,36 @@
+import argparse
+import glob
 import os
-import pickle
-from langchain_ollama import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import TextLoader
+import sys
 from langchain_ollama import OllamaLLM
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
-
-# Define file paths for the saved embeddings and FAISS index
-faiss_index_file = "embeddings/vectorstore.faiss"
-faiss_metadata_file = "embeddings/vectorstore_metadata.pkl"
-
-# Create embeddings using Ollama
-embedding_function = OllamaEmbeddings(model="mistral")
-
-# Check if the precomputed embeddings already exist
-if os.path.exists(faiss_index_file) and os.path.exists(faiss_metadata_file):
-    print("Loading precomputed embeddings...")
-    # Load the FAISS index and the document metadata (with the flag to allow dangerous deserialization)
-    vectorstore = FAISS.load_local(faiss_index_file, embedding_function, allow_dangerous_deserialization=True)
-    with open(faiss_metadata_file, "rb") as f:
-        texts = pickle.load(f)  # Load the metadata (documents)
+from index_manager import load_index
+
+# batched_embeddings.py is shared with RAG/singleDocument
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from batched_embeddings import BatchedOllamaEmbeddings
+
+parser = argparse.ArgumentParser(description="Question answering over the papers, with a saved FAISS index.")
+parser.add_argument("--papers-dir", help="index every .txt file of this directory (e.g. ../../Data/PDF_Text) instead of paper1-5.txt")
+# The saved index in embeddings/local_index was built with mistral; another model rebuilds it
+parser.add_argument("--embedding-model", default="mistral", help="Ollama embedding model, e.g. nomic-embed-text")
+parser.add_argument("--workers", type=int, default=4, help="embedding requests sent to Ollama at once")
+args = parser.parse_args()
+
+# Directory of the FAISS index (index.faiss) and its metadata (metadata.json)
+index_dir = "embeddings/local_index"
+
+# Create embeddings using Ollama, in batches of chunks with a cache by chunk hash
+embedding_function = BatchedOllamaEmbeddings(model=args.embedding_model, max_workers=args.workers,
+                                             cache_path="embeddings/embedding_cache.sqlite")
+
+# Load the saved index (memory-mapped, read-only) and embed only the papers that are new or changed since it was saved.
+# Papers removed from this list are removed from the index.
+if args.papers_dir:
+    papers = sorted(glob.glob(os.path.join(args.papers_dir, "*.txt")))
 else:
-    print("Creating new embeddings...")
-    
-    # Load multiple documents (papers)
-    documents = []
     papers = ["paper1.txt", "paper2.txt", "paper3.txt", "paper4.txt", "paper5.txt"]  # Add your paper files here
-    
-    for paper in papers:
-        loader = TextLoader(paper, encoding="utf-8")
-        documents.extend(loader.load())  # Concatenate all loaded documents into the list
-    
-    # Split documents into smaller chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30)
-    texts = text_splitter.split_documents(documents)
-    
-    # Create a FAISS vector store using the documents and embeddings
-    vectorstore = FAISS.from_documents(texts, embedding_function)
-    
-    # Save the FAISS index and the metadata (documents)
-    vectorstore.save_local(faiss_index_file)
-    with open(faiss_metadata_file, "wb") as f:
-        pickle.dump(texts, f)
-    
-    print("Embeddings created and saved.")
+index_manager, vectorstore = load_index(index_dir, embedding_function, papers, chunk_size=300, chunk_overlap=30)
 
 # Create the retriever
 retriever = vectorstore.as_retriever()
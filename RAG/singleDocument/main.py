@@ -1,10 +1,15 @@
-from langchain_ollama import OllamaEmbeddings
+import os
+import sys
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import TextLoader
 from langchain_ollama import OllamaLLM
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
 
+# batched_embeddings.py fica em RAG/, partilhado pelos scripts de RAG
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from batched_embeddings import BatchedOllamaEmbeddings
+
 # Carregar documentos
 loader = TextLoader("documento.txt", encoding="utf-8")  # Substitua pelo seu arquivo de texto
 documents = loader.load()
@@ -13,8 +18,8 @@ documents = loader.load()
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
 texts = text_splitter.split_documents(documents)
 
-# Criar embeddings usando Ollama
-embedding_function = OllamaEmbeddings(model="mistral")  # Substitua pelo modelo desejado
+# Criar embeddings usando Ollama, em batches de chunks enviados em paralelo e com cache por hash do chunk
+embedding_function = BatchedOllamaEmbeddings(model="nomic-embed-text")  # Substitua pelo modelo desejado
 
 # Criar banco de dados vetorial usando FAISS
 vectorstore = FAISS.from_documents(texts, embedding_function)